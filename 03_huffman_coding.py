@@ -91,7 +91,20 @@ Visualization Resource
 Check this website to visualize the Huffman encoding for any string message - Huffman Visualization! (https://people.ok.ubc.ca/ylucet/DS/Huffman.html)
 """
 
+import bz2
+import heapq
+import json
+import lzma
+import random
 import sys
+import time
+import tracemalloc
+import zlib
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 
 class TreeNode:
@@ -108,6 +121,49 @@ class TreeNode:
         return self.frequency < other.frequency
 
 
+class BlockIndex:
+    """
+    Sparse index of an encoded string, with the bit offset of every block_size-th character,
+    so that decoding a range of characters can start from the nearest checkpoint.
+    """
+
+    def __init__(self, block_size, offsets, length, is_bytes=False):
+        self.block_size = block_size
+        self.offsets = offsets
+        self.length = length
+        self.is_bytes = is_bytes
+
+    def __repr__(self):
+        return f"BlockIndex({self.block_size}, {len(self.offsets)} checkpoints, {self.length} characters)"
+
+
+class PackedBits:
+    """
+    Encoded data packed eight bits to a byte, most significant bit first.
+    The last byte is padded with 0 bits, length is the number of bits without the padding.
+    """
+
+    def __init__(self, data, length):
+        self.data = data
+        self.length = length
+
+    def __repr__(self):
+        return f"PackedBits({len(self.data)} bytes, {self.length} bits)"
+
+    def __len__(self):
+        return self.length
+
+    def __eq__(self, other):
+        return isinstance(other, PackedBits) and self.length == other.length and self.data == other.data
+
+    def from_bits(bits):
+        # Pack a string of "0" and "1" of any length
+        return PackedBits(HuffmanTree.bits_to_bytes(bits + "0" * (-len(bits) % 8)), len(bits))
+
+    def to_bits(self):
+        return HuffmanTree.bytes_to_bits(self.data)[: self.length]
+
+
 class HuffmanTree:
     def __init__(self, root):
         self.root = root
@@ -118,21 +174,102 @@ class HuffmanTree:
     def __lt__(self, other):
         return self.root.frequency < other.root.frequency
 
-    def calc_encoded_data(data, pq):
+    def build_code_table(root):
         # Build Huffman code table containing the unique binary code for each character
         code_table = {}
 
         # Use recursion to build the code table
-        def build_code_table(node, code):
+        def build(node, code):
             if node is None:
                 return
             if node.value is not None:
                 code_table[node.value] = code
                 return
-            build_code_table(node.left, f"{code}0")
-            build_code_table(node.right, f"{code}1")
+            build(node.left, f"{code}0")
+            build(node.right, f"{code}1")
+
+        # A tree of a single character is just a leaf, give it a one bit code so the data is not lost
+        build(root, "0" if root is not None and root.value is not None else "")
+        return code_table
+
+    def calc_max_code_length(root):
+        # Depth of the deepest leaf, which is the length of the longest code
+        if root is None or root.value is not None:
+            return 0
+        return 1 + max(HuffmanTree.calc_max_code_length(root.left), HuffmanTree.calc_max_code_length(root.right))
+
+    def calc_limited_code_lengths(freq_table, max_code_length):
+        """
+        Optimal code lengths no longer than max_code_length, using the package-merge algorithm.
+
+        Every symbol is a coin of its frequency, and each of the max_code_length levels holds one coin
+        per symbol. Starting from the deepest level, adjacent coins are packaged in pairs and merged with
+        the coins of the next level up. The 2n - 2 cheapest items of the top level are then chosen, and
+        a symbol's code length is the number of chosen items containing its coin.
+
+        Time complexity: O(n^2 * L)
+        where n is the number of unique characters and L is max_code_length,
+        since each package keeps the list of symbols it contains
+        Space complexity: O(n^2)
+        for the packages of a single level
+
+        Returns:
+            code_lengths: dictionary of character to code length
+        """
+        symbols = sorted(freq_table, key=freq_table.get)
+        coins = [(freq_table[symbol], [index]) for index, symbol in enumerate(symbols)]
 
-        build_code_table(pq[0], "")
+        items = coins
+        for _ in range(max_code_length - 1):
+            packages = [
+                (items[i][0] + items[i + 1][0], items[i][1] + items[i + 1][1]) for i in range(0, len(items) - 1, 2)
+            ]
+            items = list(heapq.merge(coins, packages, key=lambda item: item[0]))
+
+        lengths = [0] * len(symbols)
+        for _, members in items[: 2 * len(symbols) - 2]:
+            for index in members:
+                lengths[index] += 1
+
+        return {symbol: lengths[index] for index, symbol in enumerate(symbols)}
+
+    def build_canonical_tree(freq_table, code_lengths):
+        """
+        Builds a tree from code lengths by assigning canonical codes,
+        shorter codes first and in order of the frequency table within a length.
+
+        Time complexity: O(n * L)
+        since each code inserts at most L nodes
+        Space complexity: O(n * L)
+        for the nodes of the tree
+        """
+        root = TreeNode(None, 0)
+        code = 0
+        previous_length = 0
+        for symbol in sorted(freq_table, key=code_lengths.get):
+            length = code_lengths[symbol]
+            code <<= length - previous_length
+            previous_length = length
+
+            node = root
+            node.frequency += freq_table[symbol]
+            for bit in format(code, f"0{length}b")[:-1]:
+                side = "left" if bit == "0" else "right"
+                if getattr(node, side) is None:
+                    setattr(node, side, TreeNode(None, 0))
+                node = getattr(node, side)
+                node.frequency += freq_table[symbol]
+            leaf = TreeNode(symbol, freq_table[symbol])
+            if code & 1:
+                node.right = leaf
+            else:
+                node.left = leaf
+            code += 1
+
+        return root
+
+    def calc_encoded_data(data, pq):
+        code_table = HuffmanTree.build_code_table(pq[0])
 
         # Encode data using the lookup table
         encoded_data = ""
@@ -141,7 +278,92 @@ class HuffmanTree:
 
         return encoded_data
 
-    def huffman_encoding(data):
+    def calc_byte_frequencies(data, chunk_size=1 << 16):
+        """
+        Frequency table of a bytes input using NumPy.
+
+        Time complexity: O(n log c)
+        np.bincount counts every byte in vectorized passes, the O(n log c) comes from np.unique
+        which is only used to order the symbols by first occurrence (matching the pure Python path).
+        It is run on chunks of c bytes, and stops once every symbol that is present has been seen
+        Space complexity: O(c)
+        since the bytes are viewed as a uint8 array and np.unique returns index arrays for one chunk
+        """
+        symbols = np.frombuffer(data, dtype=np.uint8)
+        # np.bincount converts its input to intp, so it is also run a chunk at a time
+        counts = np.zeros(256, dtype=np.int64)
+        for chunk_start in range(0, len(symbols), chunk_size):
+            counts += np.bincount(symbols[chunk_start : chunk_start + chunk_size], minlength=256)
+        symbol_count = np.count_nonzero(counts)
+
+        first_seen = {}
+        for chunk_start in range(0, len(symbols), chunk_size):
+            present, positions = np.unique(symbols[chunk_start : chunk_start + chunk_size], return_index=True)
+            for symbol in present[np.argsort(positions)].tolist():
+                first_seen.setdefault(symbol, None)
+            if len(first_seen) == symbol_count:
+                break
+        return {symbol: int(counts[symbol]) for symbol in first_seen}
+
+    def calc_encoded_bytes(data, root, chunk_size=1 << 13):
+        """
+        Encodes a bytes input using NumPy, packing the codes into an output buffer
+        without a Python-level loop over the input.
+
+        The input is encoded chunk_size bytes at a time. Every byte of a chunk gathers its code and code
+        length from 256 entry lookup arrays, and the cumulative sum of the lengths gives the bit offset at
+        which each code ends. Repeating each code once per bit it contributes, together with its position
+        within the code, lets all bits of the chunk be extracted with a single vectorized shift, and
+        np.packbits then packs them eight to a byte. The bits of a trailing partial byte are carried
+        over to the next chunk.
+
+        Time complexity: O(n + b)
+        where n is the number of bytes and b is the number of bits in the encoded data
+        Space complexity: O(b / 8 + c * L)
+        for the packed output and the bits of one chunk of c bytes with codes of at most L bits
+
+        Returns:
+            encoded_data: PackedBits, or None if a code is too long to fit in an int64
+        """
+        code_table = HuffmanTree.build_code_table(root)
+        if max(len(code) for code in code_table.values()) > 62:
+            return None
+
+        codes = np.zeros(256, dtype=np.int64)
+        lengths = np.zeros(256, dtype=np.int64)
+        for symbol, code in code_table.items():
+            codes[symbol] = int(code, 2) if code else 0
+            lengths[symbol] = len(code)
+
+        symbols = np.frombuffer(data, dtype=np.uint8)
+        packed = []
+        carry = np.zeros(0, dtype=np.uint8)
+        total_bits = 0
+        for chunk_start in range(0, len(symbols), chunk_size):
+            # Gather the code and code length of every byte of the chunk
+            chunk = symbols[chunk_start : chunk_start + chunk_size]
+            symbol_codes = codes[chunk]
+            symbol_lengths = lengths[chunk]
+
+            # Bit offset just past the end of each code within the chunk
+            ends = np.cumsum(symbol_lengths)
+            chunk_bits = int(ends[-1])
+
+            # For every bit, the code it belongs to and how far to shift that code to reach it
+            # (most significant bit first, so the last bit of a code has a shift of 0)
+            bit_codes = np.repeat(symbol_codes, symbol_lengths)
+            shifts = np.repeat(ends - 1, symbol_lengths) - np.arange(chunk_bits)
+            bits = np.concatenate((carry, ((bit_codes >> shifts) & 1).astype(np.uint8)))
+
+            complete = len(bits) - len(bits) % 8
+            packed.append(np.packbits(bits[:complete]).tobytes())
+            carry = bits[complete:]
+            total_bits += chunk_bits
+
+        packed.append(np.packbits(carry).tobytes())
+        return PackedBits(b"".join(packed), total_bits)
+
+    def huffman_encoding(data, use_numpy=True, max_code_length=None):
         """
         Encodes a string using Huffman encoding.
 
@@ -154,23 +376,38 @@ class HuffmanTree:
         Space Complexity: O(n)
         since we need to store the frequency table, priority queue, Huffman tree, and code table.
 
+        For bytes input the encoded data is packed into bytes (see PackedBits). The frequency table and
+        encoded data are calculated with NumPy when it is installed (see calc_byte_frequencies and
+        calc_encoded_bytes), otherwise the same per character path as for strings is used.
+
         Args:
-            data: string to be encoded
+            data: string or bytes to be encoded
+            use_numpy: use the NumPy path for bytes input if NumPy is installed
+            max_code_length: if given, no code is longer than this many bits. When the Huffman tree is
+                deeper, the code lengths are recalculated with calc_limited_code_lengths.
 
         Returns:
-            encoded_data: encoded string
+            encoded_data: encoded string of "0" and "1", or PackedBits for bytes input
             tree: Huffman tree used for encoding
         """
-        if data == "" or data is None:
-            return "", HuffmanTree(None)
+        is_bytes = isinstance(data, (bytes, bytearray))
+        if not data:
+            return PackedBits(b"", 0) if is_bytes else "", HuffmanTree(None)
+        if max_code_length is not None and max_code_length < 1:
+            raise ValueError("max_code_length must be at least 1")
+
+        vectorized = use_numpy and np is not None and is_bytes
 
         # Determine the frequency of each character in the string
-        freq_table = {}
-        for char in data:
-            if char in freq_table:
-                freq_table[char] += 1
-            else:
-                freq_table[char] = 1
+        if vectorized:
+            freq_table = HuffmanTree.calc_byte_frequencies(data)
+        else:
+            freq_table = {}
+            for char in data:
+                if char in freq_table:
+                    freq_table[char] += 1
+                else:
+                    freq_table[char] = 1
 
         # Build a priority queue of TreeNode objects
         pq = []
@@ -190,8 +427,21 @@ class HuffmanTree:
             pq.append(parent)
             pq.sort()
 
+        # Replace the tree with a length-limited one if it is too deep
+        if max_code_length is not None and HuffmanTree.calc_max_code_length(pq[0]) > max_code_length:
+            if len(freq_table) > 2**max_code_length:
+                raise ValueError(f"{len(freq_table)} characters cannot be coded in {max_code_length} bits")
+            code_lengths = HuffmanTree.calc_limited_code_lengths(freq_table, max_code_length)
+            pq = [HuffmanTree.build_canonical_tree(freq_table, code_lengths)]
+
         # Calculate the encoded data
-        encoded_data = HuffmanTree.calc_encoded_data(data, pq)
+        encoded_data = None
+        if vectorized:
+            encoded_data = HuffmanTree.calc_encoded_bytes(data, pq[0])
+        if encoded_data is None:
+            encoded_data = HuffmanTree.calc_encoded_data(data, pq)
+            if is_bytes:
+                encoded_data = PackedBits.from_bits(encoded_data)
 
         # Return the encoded data with the Huffman tree
         return encoded_data, HuffmanTree(pq[0])
@@ -206,18 +456,26 @@ class HuffmanTree:
         since we need to store the decoded string.
 
         Args:
-            data: encoded string to be decoded
+            data: encoded string or PackedBits to be decoded
             tree: Huffman tree used for encoding
 
         Returns:
-            decoded_data: decoded string
+            decoded_data: decoded string, or bytes if bytes were encoded
         """
+        if isinstance(data, PackedBits):
+            if not data:
+                return b""
+            data = data.to_bits()
         if data == "":
             return ""
 
-        decoded_data = ""
+        decoded_data = []
         # Start with root
         node = tree.root
+        # A single character tree codes every character as a 0 bit
+        if node.value is not None:
+            decoded_data = [node.value] * len(data)
+            data = ""
         # Traverse the tree based on the encoded data
         # Moving left if the current bit is 0, and right if the current bit is 1
         for binary in data:
@@ -228,11 +486,307 @@ class HuffmanTree:
 
             # If the node has a value, append it to the decoded data
             if node.value is not None:
-                decoded_data += node.value
+                decoded_data.append(node.value)
                 # Reset the node to the root
                 node = tree.root
 
-        return decoded_data
+        # Byte values are ints, characters are strings
+        if isinstance(decoded_data[0], int):
+            return bytes(decoded_data)
+        return "".join(decoded_data)
+
+    def bits_to_bytes(bits):
+        # Pack a string of "0" and "1" whose length is a multiple of 8 into bytes
+        if not bits:
+            return b""
+        return int(bits, 2).to_bytes(len(bits) // 8, "big")
+
+    def bytes_to_bits(data):
+        if not data:
+            return ""
+        return format(int.from_bytes(data, "big"), f"0{len(data) * 8}b")
+
+    def build_block_index(data, tree, block_size=1024):
+        """
+        Builds the checkpoints for decode_range from the data that was encoded with tree.
+
+        Time complexity: O(n)
+        since the code length of every character is added to the running bit offset
+        Space complexity: O(n / block_size)
+        for the checkpoints
+
+        Args:
+            data: string or bytes that was encoded
+            tree: Huffman tree used for encoding
+            block_size: number of characters between checkpoints
+
+        Returns:
+            index: BlockIndex of the encoded data
+        """
+        if block_size < 1:
+            raise ValueError("block_size must be at least 1")
+
+        offsets = []
+        if data:
+            code_lengths = {char: len(code) for char, code in HuffmanTree.build_code_table(tree.root).items()}
+            bit_offset = 0
+            for position, char in enumerate(data):
+                if position % block_size == 0:
+                    offsets.append(bit_offset)
+                bit_offset += code_lengths[char]
+
+        return BlockIndex(block_size, offsets, len(data) if data else 0, isinstance(data, (bytes, bytearray)))
+
+    def decode_range(data, tree, index, start, end):
+        """
+        Decodes the characters from start up to (not including) end,
+        starting from the checkpoint at or before start instead of the first bit.
+
+        Time complexity: O(block_size + k)
+        where k is end - start, as at most block_size - 1 characters are decoded and skipped
+        Space complexity: O(k)
+        since we need to store the decoded characters
+
+        Args:
+            data: encoded string or PackedBits
+            tree: Huffman tree used for encoding
+            index: BlockIndex built for the encoded data
+            start, end: character positions, with the same meaning as in a slice, so negative
+                positions count from the end and positions past either end are clamped
+
+        Returns:
+            decoded_data: decoded string, or bytes if bytes were encoded
+        """
+        start, end, _ = slice(start, end).indices(index.length)
+        end = max(start, end)
+        if start == end:
+            return b"" if index.is_bytes else ""
+
+        root = tree.root
+        # A single character tree codes every character as a 0 bit, so every position holds the same character
+        if root.value is not None:
+            decoded_data = [root.value] * (end - start)
+        else:
+            block = start // index.block_size
+            skip = start - block * index.block_size
+            remaining = end - start
+
+            decoded_data = []
+            node = root
+            bit_offset = index.offsets[block]
+            if isinstance(data, PackedBits):
+                # Only unpack the bytes which can hold the codes of the skipped and decoded characters
+                end_bit = min(data.length, bit_offset + (skip + remaining) * HuffmanTree.calc_max_code_length(root))
+                first_byte = bit_offset // 8
+                data = HuffmanTree.bytes_to_bits(data.data[first_byte : (end_bit + 7) // 8])
+                bit_offset -= first_byte * 8
+            while remaining:
+                if data[bit_offset] == "0":
+                    node = node.left
+                else:
+                    node = node.right
+                bit_offset += 1
+
+                if node.value is not None:
+                    if skip:
+                        skip -= 1
+                    else:
+                        decoded_data.append(node.value)
+                        remaining -= 1
+                    node = root
+
+        if index.is_bytes:
+            return bytes(decoded_data)
+        return "".join(decoded_data)
+
+
+class AdaptiveTreeNode(TreeNode):
+    def __init__(self, value, frequency, parent, index):
+        super().__init__(value, frequency)
+        self.parent = parent
+        # Position in AdaptiveHuffmanTree.nodes, a lower index is a higher node number
+        self.index = index
+
+
+class AdaptiveHuffmanTree:
+    """
+    Single pass adaptive Huffman tree for bytes (the FGK algorithm).
+
+    The encoder and decoder start from the same tree holding only the NYT (not yet transmitted) node,
+    and update it identically after every byte, so no frequency table or tree needs to be sent.
+    An unseen byte is sent as the NYT code followed by its 8 bit value.
+
+    The nodes are kept in a list ordered by node number, highest first, with non-increasing weights
+    (the sibling property). Before a node's weight is incremented it is swapped with the first node of
+    the same weight, which keeps the list ordered and the tree a Huffman tree.
+    """
+
+    def __init__(self):
+        self.nyt = AdaptiveTreeNode(None, 0, None, 0)
+        self.root = self.nyt
+        self.nodes = [self.nyt]
+        self.leaves = {}
+
+    def __repr__(self):
+        return f"AdaptiveHuffmanTree({len(self.leaves)} symbols, {self.root.frequency} total)"
+
+    def code(self, node):
+        # Path from the root to the node, found by walking up the parents
+        bits = []
+        while node.parent is not None:
+            bits.append("1" if node.parent.right is node else "0")
+            node = node.parent
+        return "".join(reversed(bits))
+
+    def swap(self, first, second):
+        first_parent, second_parent = first.parent, second.parent
+        first_is_left = first_parent.left is first
+        second_is_left = second_parent.left is second
+        if first_is_left:
+            first_parent.left = second
+        else:
+            first_parent.right = second
+        if second_is_left:
+            second_parent.left = first
+        else:
+            second_parent.right = first
+        first.parent, second.parent = second_parent, first_parent
+
+        self.nodes[first.index], self.nodes[second.index] = second, first
+        first.index, second.index = second.index, first.index
+
+    def update(self, symbol):
+        """
+        Time complexity: O(d * w)
+        where d is the depth of the symbol and w is the number of nodes sharing a weight,
+        both bounded by the 513 nodes of a tree over bytes
+        Space complexity: O(1)
+        apart from the two nodes added for a new symbol
+        """
+        node = self.leaves.get(symbol)
+        if node is None:
+            # The NYT node becomes an internal node with a new NYT node and the new leaf as children
+            old_nyt = self.nyt
+            leaf = AdaptiveTreeNode(symbol, 0, old_nyt, len(self.nodes))
+            self.nyt = AdaptiveTreeNode(None, 0, old_nyt, len(self.nodes) + 1)
+            old_nyt.left = self.nyt
+            old_nyt.right = leaf
+            self.nodes += [leaf, self.nyt]
+            self.leaves[symbol] = leaf
+            node = leaf
+
+        while node is not None:
+            leader = node.index
+            while leader > 0 and self.nodes[leader - 1].frequency == node.frequency:
+                leader -= 1
+            if leader != node.index and self.nodes[leader] is not node.parent:
+                self.swap(node, self.nodes[leader])
+            node.frequency += 1
+            node = node.parent
+
+
+class AdaptiveHuffmanEncoder:
+    """
+    Incremental encoder, feed(chunk) returns the complete bytes encoded so far.
+    Up to 7 bits are held back until the next feed. flush() pads them to a whole byte and ends a message,
+    so that the message can be delivered on its own, and the stream carries on with the next feed.
+    The decoder must be told where the message ends, see AdaptiveHuffmanDecoder.feed.
+    """
+
+    def __init__(self):
+        self.tree = AdaptiveHuffmanTree()
+        self.pending = ""
+
+    def __repr__(self):
+        return f"AdaptiveHuffmanEncoder({self.tree})"
+
+    def feed(self, chunk):
+        """
+        Time complexity: O(k * d)
+        where k is the length of the chunk and d is the depth of the tree
+        Space complexity: O(k * d)
+        for the encoded bits of the chunk
+        """
+        bits = [self.pending]
+        for symbol in chunk:
+            leaf = self.tree.leaves.get(symbol)
+            if leaf is None:
+                bits.append(self.tree.code(self.tree.nyt))
+                bits.append(format(symbol, "08b"))
+            else:
+                bits.append(self.tree.code(leaf))
+            self.tree.update(symbol)
+
+        bits = "".join(bits)
+        complete = len(bits) - len(bits) % 8
+        self.pending = bits[complete:]
+        return HuffmanTree.bits_to_bytes(bits[:complete])
+
+    def flush(self):
+        # Pad with the start of an NYT code and literal, which is never a complete code for the decoder,
+        # the tree is kept so the next message is coded with what has been learnt so far
+        if not self.pending:
+            return b""
+        padding = (self.tree.code(self.tree.nyt) + "0" * 8)[: 8 - len(self.pending)]
+        bits = self.pending + padding
+        self.pending = ""
+        return HuffmanTree.bits_to_bytes(bits)
+
+
+class AdaptiveHuffmanDecoder:
+    """
+    Incremental decoder, feed(data) returns the bytes decoded so far.
+    A code split across feeds is completed by the next feed, unless the feed ends a message.
+    """
+
+    def __init__(self):
+        self.tree = AdaptiveHuffmanTree()
+        self.node = self.tree.root
+        # Bits of a literal being read after an NYT code, None when not reading a literal.
+        # The tree starts as a lone NYT node with an empty code, so the first byte is a literal
+        self.literal = ""
+
+    def __repr__(self):
+        return f"AdaptiveHuffmanDecoder({self.tree})"
+
+    def feed(self, data, end_of_message=False):
+        """
+        Time complexity: O(b + k * d)
+        where b is the number of bits, k the number of decoded bytes and d the depth of the tree
+        Space complexity: O(k)
+        for the decoded bytes
+
+        Args:
+            data: bytes of the stream
+            end_of_message: data ends where the encoder was flushed, the bits of a code left
+                unfinished are the padding added by flush and are dropped
+        """
+        decoded_data = bytearray()
+        for bit in HuffmanTree.bytes_to_bits(data):
+            if self.literal is not None:
+                self.literal += bit
+                if len(self.literal) < 8:
+                    continue
+                symbol = int(self.literal, 2)
+            else:
+                self.node = self.node.left if bit == "0" else self.node.right
+                if self.node is self.tree.nyt:
+                    self.literal = ""
+                    continue
+                if self.node.value is None:
+                    continue
+                symbol = self.node.value
+
+            decoded_data.append(symbol)
+            self.tree.update(symbol)
+            self.node = self.tree.root
+            # Before the first byte the root is the NYT node, which has an empty code
+            self.literal = "" if self.node is self.tree.nyt else None
+
+        if end_of_message:
+            self.node = self.tree.root
+            self.literal = "" if self.node is self.tree.nyt else None
+        return bytes(decoded_data)
 
 
 def included_test():
@@ -256,6 +810,7 @@ def included_test():
 # Add your own test cases: include at least three test cases
 # and two of them must include edge cases, such as null, empty or very large values
 
+
 # Test Case 1
 # Test the case where input is None
 def test_01():
@@ -318,8 +873,416 @@ def test_03():
     print("Test 03 Passed")
 
 
+# Test Case 4
+# Test the case where input is bytes, on both the NumPy and the pure Python path
+def test_04():
+    print("\nTest 04 - bytes input:\n")
+    test_bytes = bytes(range(256)) + b"AAAAAAABBBCCCCCCCDDEEEEEE" * 100
+
+    encoded_data, tree = HuffmanTree.huffman_encoding(test_bytes, use_numpy=False)
+    decoded_data = HuffmanTree.huffman_decoding(encoded_data, tree)
+
+    assert decoded_data == test_bytes, print("Test 04 Failed: decoded data does not match the input")
+
+    if np is not None:
+        numpy_encoded_data, numpy_tree = HuffmanTree.huffman_encoding(test_bytes)
+
+        assert numpy_encoded_data == encoded_data, print("Test 04 Failed: NumPy encoded data does not match")
+        assert len(numpy_encoded_data.data) == (len(numpy_encoded_data) + 7) // 8, print(
+            "Test 04 Failed: NumPy encoded data should be packed eight bits to a byte"
+        )
+        assert HuffmanTree.huffman_decoding(numpy_encoded_data, numpy_tree) == test_bytes, print(
+            "Test 04 Failed: NumPy decoded data does not match the input"
+        )
+    else:
+        print("NumPy is not installed, skipping the NumPy path")
+
+    print("Test 04 Passed")
+
+
+def code_length_report(data, max_code_length):
+    """
+    Compares the unconstrained Huffman code with one limited to max_code_length bits.
+
+    Returns:
+        report: dictionary with the longest code and encoded size in bits of both codes,
+        and the percentage increase in encoded size caused by the limit
+    """
+    encoded_data, tree = HuffmanTree.huffman_encoding(data)
+    limited_data, limited_tree = HuffmanTree.huffman_encoding(data, max_code_length=max_code_length)
+
+    return {
+        "max_code_length": HuffmanTree.calc_max_code_length(tree.root),
+        "limited_max_code_length": HuffmanTree.calc_max_code_length(limited_tree.root),
+        "encoded_bits": len(encoded_data),
+        "limited_encoded_bits": len(limited_data),
+        "ratio_cost_percent": 100 * (len(limited_data) - len(encoded_data)) / len(encoded_data),
+    }
+
+
+# Test Case 5
+# Test the case where the frequencies are very skewed and the code length is limited
+def test_05():
+    print("\nTest 05 - length-limited codes:\n")
+    # Fibonacci frequencies give the deepest possible tree
+    fibonacci = [1, 1]
+    while len(fibonacci) < 20:
+        fibonacci.append(fibonacci[-1] + fibonacci[-2])
+    test_sentence = "".join(chr(ord("A") + i) * freq for i, freq in enumerate(fibonacci))
+
+    for max_code_length in (5, 8, 12, 19):
+        encoded_data, tree = HuffmanTree.huffman_encoding(test_sentence, max_code_length=max_code_length)
+        code_lengths = [len(code) for code in HuffmanTree.build_code_table(tree.root).values()]
+
+        assert max(code_lengths) <= max_code_length, print("Test 05 Failed: code is longer than the limit")
+        # Kraft equality, the limited code is still a complete prefix code
+        assert sum(2 ** (max_code_length - length) for length in code_lengths) == 2**max_code_length, print(
+            "Test 05 Failed: code is not complete"
+        )
+        assert HuffmanTree.huffman_decoding(encoded_data, tree) == test_sentence, print(
+            "Test 05 Failed: decoded data does not match the input"
+        )
+
+    report = code_length_report(test_sentence, 8)
+    print("Length-limited code report: {}\n".format(report))
+
+    assert report["max_code_length"] == 19, print("Test 05 Failed: unconstrained code should be 19 bits")
+    assert report["limited_max_code_length"] == 8, print("Test 05 Failed: limited code should be 8 bits")
+    assert report["ratio_cost_percent"] >= 0, print("Test 05 Failed: limited code cannot beat Huffman")
+
+    try:
+        HuffmanTree.huffman_encoding(test_sentence, max_code_length=4)
+        assert False, print("Test 05 Failed: 20 characters do not fit in 4 bits")
+    except ValueError:
+        pass
+
+    print("Test 05 Passed")
+
+
+# Test Case 6
+# Test decoding ranges of the encoded data using a block index
+def test_06():
+    print("\nTest 06 - random access decoding:\n")
+    test_sentence = "The bird is the word. " * 500
+
+    encoded_data, tree = HuffmanTree.huffman_encoding(test_sentence)
+    index = HuffmanTree.build_block_index(test_sentence, tree, block_size=64)
+    print("The block index is: {}\n".format(index))
+
+    ranges = [(0, 1), (0, 64), (63, 65), (100, 1000), (10_990, 11_000), (5, 5), (10_995, 20_000), (20, 10)]
+    # Negative positions count from the end, like a slice
+    ranges += [(-10, 20), (-10, 11_000), (-100, -50), (-20_000, 5), (0, -10_990)]
+    for start, end in ranges:
+        assert HuffmanTree.decode_range(encoded_data, tree, index, start, end) == test_sentence[start:end], print(
+            "Test 06 Failed: range {}:{} does not match the input".format(start, end)
+        )
+
+    test_bytes = b"\x00\x01\x02" * 1000
+    encoded_data, tree = HuffmanTree.huffman_encoding(test_bytes)
+    index = HuffmanTree.build_block_index(test_bytes, tree, block_size=100)
+
+    assert HuffmanTree.decode_range(encoded_data, tree, index, 1234, 1240) == test_bytes[1234:1240], print(
+        "Test 06 Failed: bytes range does not match the input"
+    )
+    assert HuffmanTree.decode_range(encoded_data, tree, index, -6, -1) == test_bytes[-6:-1], print(
+        "Test 06 Failed: negative bytes range does not match the input"
+    )
+    assert HuffmanTree.decode_range(encoded_data, tree, index, 10, 10) == b"", print(
+        "Test 06 Failed: empty bytes range should be empty bytes"
+    )
+    assert HuffmanTree.huffman_decoding(*HuffmanTree.huffman_encoding(b"")) == b"", print(
+        "Test 06 Failed: empty bytes should decode to empty bytes"
+    )
+
+    print("Test 06 Passed")
+
+
+# Test Case 7
+# Test the adaptive encoder and decoder with chunks split at arbitrary points
+def test_07():
+    print("\nTest 07 - adaptive Huffman stream:\n")
+    messages = [
+        b"",
+        b"A",
+        b"AAAAAAABBBCCCCCCCDDEEEEEE",
+        bytes(range(256)),
+        b"The bird is the word" * 50,
+        b"\x00" * 1000,
+    ]
+
+    encoder = AdaptiveHuffmanEncoder()
+    encoded_data = b"".join(encoder.feed(message) for message in messages) + encoder.flush()
+
+    # Decode in uneven pieces so codes and literals are split across feeds
+    decoder = AdaptiveHuffmanDecoder()
+    decoded_data = b""
+    position = 0
+    for piece_size in [1, 2, 3, 5, 7, 11] * len(encoded_data):
+        if position >= len(encoded_data):
+            break
+        decoded_data += decoder.feed(encoded_data[position : position + piece_size])
+        position += piece_size
+
+    assert decoded_data == b"".join(messages), print("Test 07 Failed: decoded stream does not match the input")
+    assert len(encoded_data) < len(b"".join(messages)), print("Test 07 Failed: stream was not compressed")
+
+    encoder = AdaptiveHuffmanEncoder()
+    assert encoder.feed(b"") == b"" and encoder.flush() == b"", print("Test 07 Failed: empty stream should be empty")
+
+    # A live stream flushes after every message, so each is delivered and decoded in full on arrival
+    telemetry = [b'{"sensor": 1, "t": 20.5}\n', b"hello world\n", b"", b"x", b'{"sensor": 2, "t": 21.0}\n'] * 20
+    encoder = AdaptiveHuffmanEncoder()
+    decoder = AdaptiveHuffmanDecoder()
+    for message in telemetry:
+        delivered = encoder.feed(message) + encoder.flush()
+        # The message may also arrive in pieces, only the last one ends it
+        decoded_data = decoder.feed(delivered[:1]) + decoder.feed(delivered[1:], end_of_message=True)
+        assert decoded_data == message, print("Test 07 Failed: flushed message {} does not match".format(message))
+
+    print("Test 07 Passed")
+
+
+# Test Case 8
+# Test the case where the input is a single repeated character
+def test_08():
+    print("\nTest 08 - single character:\n")
+    for test_data in ["A", "AAAAAAAAAA", b"\x00" * 10]:
+        encoded_data, tree = HuffmanTree.huffman_encoding(test_data)
+        if isinstance(encoded_data, PackedBits):
+            encoded_data = encoded_data.to_bits()
+
+        assert encoded_data == "0" * len(test_data), print("Test 08 Failed: each character should be a 0 bit")
+        assert HuffmanTree.huffman_decoding(encoded_data, tree) == test_data, print(
+            "Test 08 Failed: decoded data does not match the input"
+        )
+
+    print("Test 08 Passed")
+
+
+def benchmark_adaptive_stream(messages=5000):
+    print("\nBenchmark - adaptive vs static Huffman on {} telemetry messages:\n".format(messages))
+    stream = [
+        '{{"sensor": {}, "temperature": {:.2f}, "status": "{}"}}\n'.format(
+            i % 17, 20 + (i * 37 % 100) / 10, "ok" if i % 13 else "warn"
+        ).encode()
+        for i in range(messages)
+    ]
+    size = sum(len(message) for message in stream)
+
+    # Every message is flushed, so it is delivered in full and decoded as soon as it arrives
+    encoder = AdaptiveHuffmanEncoder()
+    start = time.perf_counter()
+    delivered = [encoder.feed(message) + encoder.flush() for message in stream]
+    adaptive_time = time.perf_counter() - start
+    adaptive_size = sum(len(data) for data in delivered)
+
+    decoder = AdaptiveHuffmanDecoder()
+    start = time.perf_counter()
+    decoded = [decoder.feed(data, end_of_message=True) for data in delivered]
+    adaptive_decode_time = time.perf_counter() - start
+    assert decoded == stream, print("Benchmark failed: adaptive stream did not round trip")
+
+    # The static coder needs the whole stream, or a separate tree for every message
+    start = time.perf_counter()
+    per_message_size = sum(len(HuffmanTree.huffman_encoding(message)[0].data) for message in stream)
+    per_message_time = time.perf_counter() - start
+    whole_stream_bits = len(HuffmanTree.huffman_encoding(b"".join(stream))[0])
+
+    print(
+        "adaptive               ratio {:.3f}, {:.1f}us per message, decoded in {:.1f}us".format(
+            adaptive_size / size, adaptive_time / messages * 1e6, adaptive_decode_time / messages * 1e6
+        )
+    )
+    print(
+        "static per message     ratio {:.3f}, {:.1f}us per message (excluding the trees)".format(
+            per_message_size / size, per_message_time / messages * 1e6
+        )
+    )
+    print("static whole stream    ratio {:.3f} (only once the stream has ended)".format(whole_stream_bits / 8 / size))
+
+
+def benchmark_decode_range(size=1_000_000, slice_size=100, block_size=1024, repeat=100):
+    print("\nBenchmark - decoding {} of {} characters:\n".format(slice_size, size))
+    test_sentence = ("The bird is the word. " * (size // 22 + 1))[:size]
+    encoded_data, tree = HuffmanTree.huffman_encoding(test_sentence)
+    index = HuffmanTree.build_block_index(test_sentence, tree, block_size)
+
+    start = time.perf_counter()
+    HuffmanTree.huffman_decoding(encoded_data, tree)
+    full = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(repeat):
+        position = (i * 7919 * block_size + i) % (size - slice_size)
+        HuffmanTree.decode_range(encoded_data, tree, index, position, position + slice_size)
+    ranged = (time.perf_counter() - start) / repeat
+
+    print("full decode  {:.3f}s".format(full))
+    print("range decode {:.6f}s (block size {})".format(ranged, block_size))
+
+
+def generate_corpus(size, seed=0):
+    """
+    Deterministic benchmark inputs of the given size in bytes.
+
+    Returns:
+        corpus: dictionary of corpus name to bytes
+    """
+    rng = random.Random(seed)
+    words = ["the", "bird", "is", "word", "data", "compression", "huffman", "tree", "node", "a", "of", "to", "and"]
+    levels = ["INFO", "INFO", "INFO", "DEBUG", "WARN", "ERROR"]
+
+    text = " ".join(rng.choice(words) for _ in range(size // 3)).encode()
+    logs = "".join(
+        "2020-05-{:02d} 12:{:02d}:{:02d} {} request_id={} path=/api/v1/items/{} status={} duration_ms={}\n".format(
+            rng.randint(1, 28),
+            rng.randint(0, 59),
+            rng.randint(0, 59),
+            rng.choice(levels),
+            rng.randint(0, 10**6),
+            rng.randint(0, 999),
+            rng.choice([200, 200, 200, 404, 500]),
+            rng.randint(1, 500),
+        )
+        for _ in range(size // 60 + 1)
+    ).encode()
+    # Geometric distribution, each byte value is half as likely as the previous one
+    skewed = bytes(min(int(rng.expovariate(0.7)), 255) for _ in range(size))
+
+    return {
+        "text": text[:size],
+        "logs": logs[:size],
+        "random": bytes(rng.getrandbits(8) for _ in range(size)),
+        "skewed": skewed,
+        "single_symbol": b"A" * size,
+    }
+
+
+def huffman_compress(data):
+    encoded_data, tree = HuffmanTree.huffman_encoding(data)
+    # Size of a canonical header, the value and code length of every character
+    header = 2 * len(HuffmanTree.build_code_table(tree.root))
+    return (encoded_data, tree), len(encoded_data) // 8 + (len(encoded_data) % 8 > 0) + header
+
+
+def benchmark_codecs(size=256 * 1024, repeat=3, json_path=None):
+    """
+    Measures the compression ratio, encode and decode throughput and peak memory
+    of the Huffman coder and the zlib, bz2 and lzma standard library codecs on generate_corpus.
+
+    The Huffman compressed size counts the packed bits and a canonical header of 2 bytes per character.
+    Peak memory is measured with tracemalloc in a separate run, so it does not slow down the timings.
+
+    Returns:
+        results: list of dictionaries, one per corpus and codec, also written as JSON to json_path if given
+    """
+    print("\nBenchmark - Huffman against standard library codecs on {} bytes:\n".format(size))
+    codecs = {
+        "huffman": (huffman_compress, lambda compressed: HuffmanTree.huffman_decoding(*compressed)),
+        "zlib": (lambda data: (zlib.compress(data), None), zlib.decompress),
+        "bz2": (lambda data: (bz2.compress(data), None), bz2.decompress),
+        "lzma": (lambda data: (lzma.compress(data), None), lzma.decompress),
+    }
+
+    results = []
+    for corpus, data in generate_corpus(size).items():
+        for codec, (compress, decompress) in codecs.items():
+            encode_time = decode_time = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                compressed, compressed_size = compress(data)
+                encode_time = min(encode_time, time.perf_counter() - start)
+                if compressed_size is None:
+                    compressed_size = len(compressed)
+
+                start = time.perf_counter()
+                decompressed = decompress(compressed)
+                decode_time = min(decode_time, time.perf_counter() - start)
+
+            assert decompressed == data, print("Benchmark failed: {} did not round trip {}".format(codec, corpus))
+
+            tracemalloc.start()
+            decompress(compress(data)[0])
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            results.append(
+                {
+                    "corpus": corpus,
+                    "codec": codec,
+                    "size": len(data),
+                    "compressed_size": compressed_size,
+                    "ratio": compressed_size / len(data),
+                    "encode_mb_s": len(data) / encode_time / 1e6,
+                    "decode_mb_s": len(data) / decode_time / 1e6,
+                    "peak_memory_bytes": peak_memory,
+                }
+            )
+
+    print(
+        "{:<14}{:<8}{:>8}{:>12}{:>12}{:>14}".format("corpus", "codec", "ratio", "enc MB/s", "dec MB/s", "peak memory")
+    )
+    for result in results:
+        print(
+            "{corpus:<14}{codec:<8}{ratio:>8.3f}{encode_mb_s:>12.2f}{decode_mb_s:>12.2f}{peak_memory_bytes:>14}".format(
+                **result
+            )
+        )
+
+    if json_path is not None:
+        with open(json_path, "w") as json_file:
+            json.dump(
+                {"python": sys.version.split()[0], "numpy": np is not None, "size": size, "results": results},
+                json_file,
+                indent=2,
+            )
+        print("\nResults written to {}".format(json_path))
+
+    return results
+
+
+def benchmark_bytes_encoding(size=1_000_000, repeat=3):
+    print("\nBenchmark - bytes encoding of {} bytes:\n".format(size))
+    # Skewed distribution over the whole byte range
+    test_bytes = bytes((i * i) % 251 % (1 + i % 64) for i in range(size))
+
+    paths = [("pure Python", False)]
+    if np is not None:
+        paths.append(("NumPy", True))
+    else:
+        print("NumPy is not installed, only benchmarking the pure Python path\n")
+
+    for name, use_numpy in paths:
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            encoded_data, _ = HuffmanTree.huffman_encoding(test_bytes, use_numpy=use_numpy)
+            best = min(best, time.perf_counter() - start)
+
+        tracemalloc.start()
+        HuffmanTree.huffman_encoding(test_bytes, use_numpy=use_numpy)
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        print(
+            "{:<12} {:.3f}s ({:.2f} MB/s), peak memory {:.1f} MB, output {:.2f} MB".format(
+                name, best, size / best / 1e6, peak_memory / 1e6, len(encoded_data.data) / 1e6
+            )
+        )
+
+
 if __name__ == "__main__":
     included_test()
     test_01()
     test_02()
     test_03()
+    test_04()
+    test_05()
+    test_06()
+    test_07()
+    test_08()
+    if "--benchmark" in sys.argv:
+        benchmark_bytes_encoding()
+        benchmark_decode_range()
+        benchmark_adaptive_stream()
+        benchmark_codecs(json_path=sys.argv[sys.argv.index("--json") + 1] if "--json" in sys.argv else None)
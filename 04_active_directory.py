@@ -5,18 +5,58 @@ In Windows Active Directory, a group can consist of user(s) and group(s) themsel
 Write a function that provides an efficient look up of whether the user is in a group.
 """
 
+import csv
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from array import array
+from bisect import bisect_left, insort
+from collections import deque
+
+# resource is only available on Unix, it is only used to report the peak RSS in benchmark_load_directory
+try:
+    import resource
+except ImportError:
+    resource = None
+
 
 class Group(object):
+    # Slots keep large hierarchies compact, there is no per instance __dict__
+    __slots__ = ("name", "_groups", "_users", "indexes")
+
     def __init__(self, _name):
         self.name = _name
-        self.groups = []
-        self.users = []
+        # Dictionaries used as ordered sets, for O(1) membership checks
+        self._groups = {}
+        self._users = {}
+        # Membership indexes to notify when the group changes
+        self.indexes = []
 
     def add_group(self, group):
-        self.groups.append(group)
+        if group in self._groups:
+            return
+        self._groups[group] = None
+        # A memo removes itself from indexes when notified, so loop over a copy
+        for index in list(self.indexes):
+            index.group_added(self, group)
 
     def add_user(self, user):
-        self.users.append(user)
+        if user in self._users:
+            return
+        self._users[user] = None
+        for index in list(self.indexes):
+            index.user_added(self, user)
+
+    # Read-only, set-like views in the order the members were added
+    @property
+    def groups(self):
+        return self._groups.keys()
+
+    @property
+    def users(self):
+        return self._users.keys()
 
     def get_groups(self):
         return self.groups
@@ -32,11 +72,14 @@ def is_user_in_group(user, group):
     """
     Return True if user is in the group, False otherwise.
 
-    Time complexity: O(n)
-    the time complexity is O(n) where n is the number of groups in the hierarchy
+    The hierarchy is walked breadth first with a visited set, so cycles are only walked once
+    and deep hierarchies do not hit the recursion limit.
+
+    Time complexity: O(n + m)
+    where n is the number of groups and m the number of subgroup links in the hierarchy,
+    as checking the users of a group is an O(1) lookup
     Space complexity: O(n)
-    since we are using a dictionary to store the cache,
-    the space complexity is O(n) where n is the number of groups in the hierarchy
+    for the visited set and queue
 
     Args:
       user(str): user name/id
@@ -46,14 +89,354 @@ def is_user_in_group(user, group):
         print("There should be a user and group in the function call")
         return False
 
-    if user in group.get_users():
-        return True
-    else:
-        for group in group.get_groups():
-            return is_user_in_group(user, group)
+    visited = {group}
+    queue = deque([group])
+    while queue:
+        current = queue.popleft()
+        if user in current.get_users():
+            return True
+        for subgroup in current.get_groups():
+            if subgroup not in visited:
+                visited.add(subgroup)
+                queue.append(subgroup)
     return False
 
 
+class MembershipIndex(object):
+    """
+    Precomputed effective users (direct or through any subgroup) of every group in a hierarchy,
+    so that membership checks are a set lookup instead of a walk of the hierarchy.
+
+    The index registers itself with every group it covers and is kept up to date as
+    add_user and add_group are called, by pushing only the newly reachable users up to the parents.
+
+    With reverse_index, every group is interned to an integer id and every user has a sorted array of
+    the ids of its effective groups, for groups_of and is_user_in_any_group. The arrays are sparse,
+    4 bytes per group a user is in however many groups there are, and are only kept when asked for.
+    """
+
+    def __init__(self, *groups, reverse_index=False):
+        self.effective_users = {}
+        self.parents = {}
+        self.group_ids = {}
+        self.groups = []
+        self.user_groups = {} if reverse_index else None
+        for group in groups:
+            self.add_hierarchy(group)
+
+    def __repr__(self):
+        return f"MembershipIndex({len(self.effective_users)} groups)"
+
+    def add_hierarchy(self, group):
+        """
+        Indexes the group and all groups beneath it.
+
+        Time complexity: O(g + u * a)
+        where g is the number of groups, u the number of direct memberships
+        and a the number of ancestors a user is pushed up to
+        Space complexity: O(g * e)
+        where e is the average number of effective users of a group
+        """
+        new_groups = []
+        stack = [group]
+        while stack:
+            current = stack.pop()
+            if current in self.effective_users:
+                continue
+            self.effective_users[current] = set()
+            self.parents.setdefault(current, [])
+            self.group_ids[current] = len(self.groups)
+            self.groups.append(current)
+            current.indexes.append(self)
+            new_groups.append(current)
+            for subgroup in current.get_groups():
+                self.parents.setdefault(subgroup, []).append(current)
+                stack.append(subgroup)
+
+        # Users of new subgroups are pushed up from the subgroups themselves,
+        # subgroups which were already indexed need their effective users pushed to their new parents
+        added = set(new_groups)
+        for current in new_groups:
+            self.push_users(current, set(current.get_users()))
+            for subgroup in current.get_groups():
+                if subgroup not in added:
+                    self.push_users(current, self.effective_users[subgroup])
+
+    def push_users(self, group, users):
+        # Add users to the group and its ancestors, stopping wherever they are all already present
+        stack = [(group, users)]
+        while stack:
+            current, users = stack.pop()
+            new_users = users - self.effective_users[current]
+            if new_users:
+                self.effective_users[current] |= new_users
+                if self.user_groups is not None:
+                    group_id = self.group_ids[current]
+                    for user in new_users:
+                        group_ids = self.user_groups.get(user)
+                        if group_ids is None:
+                            self.user_groups[user] = array("I", [group_id])
+                        else:
+                            insort(group_ids, group_id)
+                for parent in self.parents[current]:
+                    stack.append((parent, new_users))
+
+    def user_added(self, group, user):
+        self.push_users(group, {user})
+
+    def group_added(self, group, subgroup):
+        if subgroup not in self.effective_users:
+            self.add_hierarchy(subgroup)
+        if group not in self.parents[subgroup]:
+            self.parents[subgroup].append(group)
+        self.push_users(group, self.effective_users[subgroup])
+
+    def is_user_in_group(self, user, group):
+        """
+        Return True if user is in the group, False otherwise.
+
+        Time complexity: O(1)
+        since the effective users of the group are a set
+        Space complexity: O(1)
+        """
+        if not group or not user:
+            print("There should be a user and group in the function call")
+            return False
+
+        users = self.effective_users.get(group)
+        if users is None:
+            print("Group {} is not in the index".format(group.get_name()))
+            return False
+        return user in users
+
+    def check_reverse_index(self):
+        if self.user_groups is None:
+            raise ValueError("The index was built without reverse_index=True")
+
+    def groups_of(self, user):
+        """
+        Return the effective groups of the user, in the order they were indexed.
+
+        Time complexity: O(k)
+        where k is the number of groups the user is in
+        Space complexity: O(k)
+        for the list of groups
+        """
+        self.check_reverse_index()
+        return [self.groups[group_id] for group_id in self.user_groups.get(user, ())]
+
+    def group_mask(self, groups):
+        # Set of the ids of the groups, which can be reused for many is_user_in_any_group calls
+        return frozenset(self.group_ids[group] for group in groups if group in self.group_ids)
+
+    def is_user_in_any_group(self, user, groups):
+        """
+        Return True if user is in at least one of the groups, False otherwise.
+
+        Time complexity: O(min(k, m) * log(max(k, m)))
+        where k is the number of groups the user is in and m the number of groups checked,
+        as the smaller of the two is looked up in the other
+        Space complexity: O(1)
+
+        Args:
+          user(str): user name/id
+          groups: list of groups, or a mask from group_mask
+        """
+        self.check_reverse_index()
+        if not isinstance(groups, frozenset):
+            groups = self.group_mask(groups)
+        group_ids = self.user_groups.get(user, ())
+        if len(group_ids) <= len(groups):
+            return any(group_id in groups for group_id in group_ids)
+        for group_id in groups:
+            position = bisect_left(group_ids, group_id)
+            if position < len(group_ids) and group_ids[position] == group_id:
+                return True
+        return False
+
+
+class MembershipMemo(object):
+    """
+    Memoized effective users of the groups reached while checking a batch of (user, group) pairs,
+    so that each subgroup is walked at most once however many pairs share it.
+
+    Groups in a cycle all have the same effective users, so the hierarchy is split into strongly
+    connected components (Tarjan's algorithm, iteratively) and each component shares one set.
+    The memo registers itself with the groups it has walked and is cleared when any of them changes.
+    """
+
+    def __init__(self):
+        self.effective_users = {}
+
+    def __repr__(self):
+        return f"MembershipMemo({len(self.effective_users)} groups)"
+
+    def clear(self):
+        for group in self.effective_users:
+            group.indexes.remove(self)
+        self.effective_users = {}
+
+    def user_added(self, group, user):
+        self.clear()
+
+    def group_added(self, group, subgroup):
+        self.clear()
+
+    def get_effective_users(self, group):
+        """
+        Time complexity: O(n + m + e)
+        where n and m are the groups and subgroup links not yet memoized and
+        e is the total size of the effective user sets created for them
+        Space complexity: O(n + e)
+        """
+        if group in self.effective_users:
+            return self.effective_users[group]
+
+        order = {group: 0}
+        lowlink = {group: 0}
+        stack = [group]
+        on_stack = {group}
+        work = [(group, iter(group.get_groups()))]
+        while work:
+            current, subgroups = work[-1]
+            descended = False
+            for subgroup in subgroups:
+                if subgroup in self.effective_users:
+                    continue
+                if subgroup not in order:
+                    order[subgroup] = lowlink[subgroup] = len(order)
+                    stack.append(subgroup)
+                    on_stack.add(subgroup)
+                    work.append((subgroup, iter(subgroup.get_groups())))
+                    descended = True
+                    break
+                if subgroup in on_stack:
+                    lowlink[current] = min(lowlink[current], order[subgroup])
+            if descended:
+                continue
+
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[current])
+            if lowlink[current] != order[current]:
+                continue
+
+            # current is the root of a component, every subgroup outside it is already memoized
+            component = []
+            while True:
+                member = stack.pop()
+                on_stack.discard(member)
+                component.append(member)
+                if member is current:
+                    break
+            users = set()
+            for member in component:
+                users.update(member.get_users())
+                for subgroup in member.get_groups():
+                    if subgroup in self.effective_users:
+                        users |= self.effective_users[subgroup]
+            for member in component:
+                self.effective_users[member] = users
+                member.indexes.append(self)
+
+        return self.effective_users[group]
+
+    def check_many(self, pairs):
+        """
+        Return a list with True for every (user, group) pair where the user is in the group, False otherwise.
+
+        Time complexity: O(p + n + m + e)
+        where p is the number of pairs, and the walk of the n groups and m subgroup links
+        reachable from the pairs is shared by the whole batch
+        Space complexity: O(p + n + e)
+        """
+        results = []
+        for user, group in pairs:
+            if not group or not user:
+                print("There should be a user and group in the function call")
+                results.append(False)
+            else:
+                results.append(user in self.get_effective_users(group))
+        return results
+
+
+def check_many(pairs, memo=None):
+    """
+    Return a list with True for every (user, group) pair where the user is in the group, False otherwise.
+
+    Args:
+      pairs: iterable of (user, group) pairs
+      memo(class:MembershipMemo): memo to reuse across batches, a new one is used for this batch if None
+    """
+    if memo is None:
+        memo = MembershipMemo()
+        results = memo.check_many(pairs)
+        memo.clear()
+        return results
+    return memo.check_many(pairs)
+
+
+def load_directory(export, build_index=False):
+    """
+    Builds the hierarchy from a directory export, one membership per CSV row:
+
+        group,user,<user id>
+        group,group,<subgroup name>
+        group,,                         (a group without members)
+
+    Blank rows and rows starting with # are skipped. The export is read row by row, so only the
+    hierarchy itself is kept in memory, and user ids and group names are interned so that each
+    distinct string is stored once however many rows mention it.
+
+    Time complexity: O(r)
+    where r is the number of rows, plus building the index if requested
+    Space complexity: O(g + u)
+    where g is the number of groups and u the number of memberships
+
+    Args:
+      export: path of the export file, or an iterable of lines
+      build_index(bool): also build a MembershipIndex over every group
+
+    Returns:
+      groups: dictionary of group name to Group
+      index: MembershipIndex of the groups, or None if build_index is False
+    """
+    groups = {}
+
+    def get_group(name):
+        group = groups.get(name)
+        if group is None:
+            name = sys.intern(name)
+            group = groups[name] = Group(name)
+        return group
+
+    def load(lines):
+        for line_number, row in enumerate(csv.reader(lines), 1):
+            if not row or not row[0].strip() or row[0].startswith("#"):
+                continue
+            if len(row) != 3:
+                raise ValueError("Line {}: expected group,type,member but got {}".format(line_number, row))
+
+            group_name, kind, member = (field.strip() for field in row)
+            group = get_group(group_name)
+            if kind == "user":
+                group.add_user(sys.intern(member))
+            elif kind == "group":
+                group.add_group(get_group(member))
+            elif kind or member:
+                raise ValueError("Line {}: member type should be user or group, not {}".format(line_number, kind))
+
+    if isinstance(export, str):
+        with open(export, newline="") as export_file:
+            load(export_file)
+    else:
+        load(export)
+
+    index = MembershipIndex(*groups.values()) if build_index else None
+    return groups, index
+
+
 # Default test case
 def default_test():
     parent = Group("parent")
@@ -81,6 +464,7 @@ def default_test():
 # Add your own test cases: include at least three test cases
 # and two of them must include edge cases, such as null, empty or very large values
 
+
 # Test Case 1
 # Test where None is passed in as a user or group
 def test_01():
@@ -118,8 +502,416 @@ def test_03():
     print("Test 03 Passed")
 
 
+# Test Case 4
+# Test the membership index against the walk, including users and groups added after it is built
+def test_04():
+    groups = {}
+    for i in range(100):
+        groups[i] = Group("group" + str(i))
+        groups[i].add_user("user" + str(i))
+        if i > 0:
+            groups[(i - 1) // 2].add_group(groups[i])
+
+    index = MembershipIndex(groups[0])
+
+    for user in ["user0", "user5", "user99", "user100"]:
+        for group in groups.values():
+            assert index.is_user_in_group(user, group) == is_user_in_group(
+                user, group
+            ), "Test 04 failed, {} in {}".format(user, group.get_name())
+
+    # A later user and a later subtree reach every ancestor
+    groups[99].add_user("late_user")
+    extra = Group("extra")
+    extra.add_user("extra_user")
+    groups[50].add_group(extra)
+
+    assert index.is_user_in_group("late_user", groups[0]) == True, "Test 04 failed, late_user should be in group0"
+    assert index.is_user_in_group("late_user", groups[1]) == False, "Test 04 failed, late_user should not be in group1"
+    assert index.is_user_in_group("extra_user", groups[0]) == True, "Test 04 failed, extra_user should be in group0"
+    assert index.is_user_in_group("extra_user", extra) == True, "Test 04 failed, extra_user should be in extra"
+
+    extra.add_user("extra_user2")
+    assert index.is_user_in_group("extra_user2", groups[2]) == True, "Test 04 failed, extra_user2 should be in group2"
+
+    print("Test 04 Passed")
+
+
+# Test Case 5
+# Test cyclic hierarchies and a chain deeper than the recursion limit
+def test_05():
+    first = Group("first")
+    second = Group("second")
+    third = Group("third")
+    first.add_group(second)
+    second.add_group(third)
+    third.add_group(first)
+    third.add_user("third_user")
+
+    assert is_user_in_group("third_user", first) == True, "Test 05 failed, third_user should be in first"
+    assert is_user_in_group("other_user", first) == False, "Test 05 failed, other_user should not be in first"
+
+    index = MembershipIndex(first)
+    assert index.is_user_in_group("third_user", second) == True, "Test 05 failed, third_user should be in second"
+
+    depth = sys.getrecursionlimit() * 2
+    chain = [Group("chain" + str(i)) for i in range(depth)]
+    for parent, child in zip(chain, chain[1:]):
+        parent.add_group(child)
+    chain[-1].add_user("deep_user")
+
+    assert is_user_in_group("deep_user", chain[0]) == True, "Test 05 failed, deep_user should be in chain0"
+
+    # Adding the same user or group twice does not duplicate it
+    first.add_user("first_user")
+    first.add_user("first_user")
+    first.add_group(second)
+    assert len(first.get_users()) == 1, "Test 05 failed, first should have one user"
+    assert len(first.get_groups()) == 1, "Test 05 failed, first should have one subgroup"
+    assert first.get_users() == {"first_user"}, "Test 05 failed, get_users should be set-like"
+    assert list(first.get_groups()) == [second], "Test 05 failed, get_groups should list the subgroups"
+    assert first.users == {"first_user"} and list(first.groups) == [second], "Test 05 failed, members"
+    try:
+        first.users = ["someone"]
+        assert False, "Test 05 failed, users should be read-only"
+    except AttributeError:
+        pass
+
+    print("Test 05 Passed")
+
+
+# Test Case 6
+# Test the reverse lookup of the groups of a user
+def test_06():
+    parent = Group("parent")
+    child = Group("child")
+    sub_child = Group("subchild")
+    other = Group("other")
+    parent.add_group(child)
+    child.add_group(sub_child)
+    parent.add_group(other)
+    sub_child.add_user("sub_child_user")
+    other.add_user("other_user")
+
+    index = MembershipIndex(parent, reverse_index=True)
+
+    assert set(index.groups_of("sub_child_user")) == {parent, child, sub_child}, "Test 06 failed, sub_child_user"
+    assert index.groups_of("other_user") == [parent, other], "Test 06 failed, other_user"
+    assert index.groups_of("missing_user") == [], "Test 06 failed, missing_user should be in no group"
+
+    mask = index.group_mask([child, other])
+    assert index.is_user_in_any_group("sub_child_user", mask) == True, "Test 06 failed, sub_child_user is in child"
+    assert index.is_user_in_any_group("other_user", [child, sub_child]) == False, "Test 06 failed, other_user"
+
+    # A user added later is in the reverse index too
+    child.add_user("child_user")
+    assert index.groups_of("child_user") == [parent, child], "Test 06 failed, child_user"
+
+    # The reverse index is only kept when asked for
+    try:
+        MembershipIndex(parent).groups_of("child_user")
+        assert False, "Test 06 failed, groups_of needs the reverse index"
+    except ValueError:
+        pass
+
+    print("Test 06 Passed")
+
+
+# Test Case 7
+# Test checking a batch of pairs with a memo, including cycles and changes between batches
+def test_07():
+    groups = {}
+    for i in range(50):
+        groups[i] = Group("group" + str(i))
+        groups[i].add_user("user" + str(i))
+        if i > 0:
+            groups[(i - 1) // 3].add_group(groups[i])
+    # A cycle between group1 and group40
+    groups[40].add_group(groups[1])
+
+    pairs = [("user" + str(u), groups[g]) for u in range(0, 55, 3) for g in range(50)] + [(None, groups[0])]
+    expected = [is_user_in_group(user, group) for user, group in pairs]
+
+    assert check_many(pairs) == expected, "Test 07 failed, check_many should match is_user_in_group"
+
+    memo = MembershipMemo()
+    assert check_many(pairs, memo) == expected, "Test 07 failed, memoized check_many should match"
+    assert memo.get_effective_users(groups[1]) is memo.get_effective_users(
+        groups[40]
+    ), "Test 07 failed, a cycle should share one set"
+
+    # Changing the hierarchy clears the memo
+    groups[49].add_user("new_user")
+    assert check_many([("new_user", groups[0])], memo) == [True], "Test 07 failed, new_user should be in group0"
+    new_group = Group("new_group")
+    new_group.add_user("new_group_user")
+    groups[10].add_group(new_group)
+    assert check_many([("new_group_user", groups[0])], memo) == [True], "Test 07 failed, new_group_user"
+
+    print("Test 07 Passed")
+
+
+# Test Case 8
+# Test loading a hierarchy from an export
+def test_08():
+    export = [
+        "# group,type,member",
+        "parent,group,child",
+        "child,group,subchild",
+        "subchild,user,sub_child_user",
+        "",
+        "parent,user,parent_user",
+        "empty,,",
+    ]
+
+    groups, index = load_directory(export, build_index=True)
+
+    assert set(groups) == {"parent", "child", "subchild", "empty"}, "Test 08 failed, wrong groups loaded"
+    assert is_user_in_group("sub_child_user", groups["parent"]) == True, "Test 08 failed, sub_child_user in parent"
+    assert index.is_user_in_group("sub_child_user", groups["child"]) == True, "Test 08 failed, index sub_child_user"
+    assert index.is_user_in_group("parent_user", groups["child"]) == False, "Test 08 failed, parent_user not in child"
+    assert groups["empty"].get_users() == set(), "Test 08 failed, empty should have no users"
+
+    for bad_export in [["parent,user"], ["parent,manager,someone"]]:
+        try:
+            load_directory(bad_export)
+            assert False, "Test 08 failed, {} should not load".format(bad_export)
+        except ValueError:
+            pass
+
+    print("Test 08 Passed")
+
+
+# Test Case 9
+# Test indexing a new parent of a group which is already indexed
+def test_09():
+    # The subgroup is indexed before the parent which reaches it
+    parent = Group("parent")
+    child = Group("child")
+    parent.add_group(child)
+    child.add_user("child_user")
+    index = MembershipIndex(child, parent, reverse_index=True)
+    assert index.is_user_in_group("child_user", parent) == True, "Test 09 failed, child_user should be in parent"
+
+    # A new group added under an indexed group, itself containing an indexed group
+    other = Group("other")
+    other.add_user("other_user")
+    index.add_hierarchy(other)
+    middle = Group("middle")
+    middle.add_group(other)
+    parent.add_group(middle)
+    assert index.is_user_in_group("other_user", middle) == True, "Test 09 failed, other_user should be in middle"
+    assert index.is_user_in_group("other_user", parent) == True, "Test 09 failed, other_user should be in parent"
+
+    # Users added later still reach the new parents
+    other.add_user("late_user")
+    assert index.is_user_in_group("late_user", parent) == True, "Test 09 failed, late_user should be in parent"
+    assert index.groups_of("late_user") == [parent, other, middle], "Test 09 failed, groups of late_user"
+
+    print("Test 09 Passed")
+
+
+# Test Case 10
+# Test a memo and an index registered on the same groups, both are notified of changes
+def test_10():
+    parent = Group("parent")
+    child = Group("child")
+    parent.add_group(child)
+
+    memo = MembershipMemo()
+    assert check_many([("user", parent)], memo) == [False], "Test 10 failed, user should not be in parent yet"
+    index = MembershipIndex(parent)
+
+    child.add_user("user")
+    assert is_user_in_group("user", parent) == True, "Test 10 failed, user should be in parent"
+    assert index.is_user_in_group("user", parent) == True, "Test 10 failed, the index should see user"
+    assert check_many([("user", parent)], memo) == [True], "Test 10 failed, the memo should see user"
+
+    other = Group("other")
+    other.add_user("other_user")
+    child.add_group(other)
+    assert index.is_user_in_group("other_user", parent) == True, "Test 10 failed, the index should see other_user"
+    assert check_many([("other_user", parent)], memo) == [True], "Test 10 failed, the memo should see other_user"
+
+    print("Test 10 Passed")
+
+
+def benchmark_load_directory(user_count=10**6, group_count=10**5, build_index=False):
+    print("\nBenchmark - loading an export of {} users in {} groups:\n".format(user_count, group_count))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "export.csv")
+        with open(path, "w", newline="") as export_file:
+            writer = csv.writer(export_file)
+            # A tree of groups with 10 subgroups each, and every user in one or two groups
+            for i in range(1, group_count):
+                writer.writerow(["group" + str((i - 1) // 10), "group", "group" + str(i)])
+            for user in range(user_count):
+                writer.writerow(["group" + str(user % group_count), "user", "user" + str(user)])
+                if user % 3 == 0:
+                    writer.writerow(["group" + str(user * 7 % group_count), "user", "user" + str(user)])
+        size = os.path.getsize(path)
+
+        if resource is not None:
+            rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        groups, index = load_directory(path, build_index=build_index)
+        load_time = time.perf_counter() - start
+        if resource is not None:
+            rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        del groups, index
+
+        # Peak traced memory in a separate run, as tracing allocations slows loading down
+        tracemalloc.start()
+        load_directory(path, build_index=build_index)
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    print("export size   {:.1f} MB".format(size / 1e6))
+    print("load time     {:.2f}s{}".format(load_time, " (including the index)" if build_index else ""))
+    print("peak traced   {:.1f} MB".format(peak_memory / 1e6))
+    # ru_maxrss is in kilobytes on Linux
+    if resource is not None:
+        print(
+            "peak RSS      {:.1f} MB, grew by {:.1f} MB while loading".format(
+                rss_after / 1e3, (rss_after - rss_before) / 1e3
+            )
+        )
+
+
+def benchmark_check_many(batch_sizes=(10, 100, 1000, 10000), group_count=5000):
+    print("\nBenchmark - per pair cost of check_many against is_user_in_group:\n")
+    groups = [Group("group" + str(i)) for i in range(group_count)]
+    for i, group in enumerate(groups[1:], 1):
+        groups[(i - 1) // 4].add_group(group)
+        group.add_user("user" + str(i))
+
+    for batch_size in batch_sizes:
+        pairs = [("user" + str(i * 7919 % group_count), groups[i * 31 % 50]) for i in range(batch_size)]
+
+        start = time.perf_counter()
+        check_many(pairs)
+        batch_time = (time.perf_counter() - start) / batch_size
+
+        sample = pairs[:100]
+        start = time.perf_counter()
+        for user, group in sample:
+            is_user_in_group(user, group)
+        walk_time = (time.perf_counter() - start) / len(sample)
+
+        print(
+            "batch {:>6}  check_many {:>9.2f}us per pair, is_user_in_group {:>9.2f}us per pair".format(
+                batch_size, batch_time * 1e6, walk_time * 1e6
+            )
+        )
+
+
+def benchmark_reverse_lookup(group_count=10**5, user_count=10**5, queries=200):
+    print("\nBenchmark - groups of a user, reverse index against walking every group:\n")
+    # A tree of groups four wide, with the users spread across the groups
+    groups = [Group("group" + str(i)) for i in range(group_count)]
+    for i, group in enumerate(groups[1:], 1):
+        groups[(i - 1) // 4].add_group(group)
+    for user in range(user_count):
+        groups[user * 7919 % group_count].add_user("user" + str(user))
+
+    for reverse_index in (False, True):
+        start = time.perf_counter()
+        index = MembershipIndex(groups[0], reverse_index=reverse_index)
+        build_time = time.perf_counter() - start
+
+        # Memory in a separate build, as tracing allocations slows it down
+        del index
+        tracemalloc.start()
+        index = MembershipIndex(groups[0], reverse_index=reverse_index)
+        index_memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(
+            "index {:<20} build {:.2f}s, {:.1f} MB".format(
+                "with reverse index" if reverse_index else "without", build_time, index_memory / 1e6
+            )
+        )
+
+    reverse_bytes = sum(sys.getsizeof(group_ids) for group_ids in index.user_groups.values()) / user_count
+    print("reverse index per user  {:.1f} bytes for {} groups".format(reverse_bytes, group_count))
+    users = ["user" + str(i * 97 % user_count) for i in range(queries)]
+
+    start = time.perf_counter()
+    for user in users:
+        index.groups_of(user)
+    print("groups_of               {:.2f}us".format((time.perf_counter() - start) / queries * 1e6))
+
+    some_groups = groups[::40]
+    mask = index.group_mask(some_groups)
+    start = time.perf_counter()
+    for user in users:
+        index.is_user_in_any_group(user, mask)
+    print("in any of {} groups   {:.2f}us".format(len(some_groups), (time.perf_counter() - start) / queries * 1e6))
+
+    start = time.perf_counter()
+    for user in users[:10]:
+        [group for group in groups if is_user_in_group(user, group)]
+    print("walk every group        {:.2f}us".format((time.perf_counter() - start) / 10 * 1e6))
+
+
+def build_benchmark_hierarchy(shape, size):
+    groups = [Group("group" + str(i)) for i in range(size)]
+    if shape == "deep chain":
+        for parent, child in zip(groups, groups[1:]):
+            parent.add_group(child)
+    elif shape == "wide fan-out":
+        for child in groups[1:]:
+            groups[0].add_group(child)
+    elif shape == "cyclic":
+        # A ring with a chord every 10 groups back to the start
+        for i, group in enumerate(groups):
+            group.add_group(groups[(i + 1) % size])
+            if i % 10 == 0:
+                group.add_group(groups[i // 2])
+    groups[-1].add_user("last_user")
+    return groups
+
+
+def benchmark_membership(sizes=(10**5, 10**6)):
+    print("\nBenchmark - is_user_in_group walk and MembershipIndex lookup:\n")
+    for size in sizes:
+        for shape in ["deep chain", "wide fan-out", "cyclic"]:
+            groups = build_benchmark_hierarchy(shape, size)
+
+            start = time.perf_counter()
+            found = is_user_in_group("last_user", groups[0])
+            not_found = is_user_in_group("missing_user", groups[0])
+            walk_time = (time.perf_counter() - start) / 2
+
+            start = time.perf_counter()
+            index = MembershipIndex(groups[0])
+            build_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            assert index.is_user_in_group("last_user", groups[0]) == found == True
+            assert index.is_user_in_group("missing_user", groups[0]) == not_found == False
+            lookup_time = (time.perf_counter() - start) / 2
+
+            print(
+                "{:>8} groups {:<13} walk {:.3f}s, index build {:.3f}s, index lookup {:.2f}us".format(
+                    size, shape, walk_time, build_time, lookup_time * 1e6
+                )
+            )
+
+
 if __name__ == "__main__":
     default_test()
     test_01()
     test_02()
     test_03()
+    test_04()
+    test_05()
+    test_06()
+    test_07()
+    test_08()
+    test_09()
+    test_10()
+    if "--benchmark" in sys.argv:
+        benchmark_membership()
+        benchmark_reverse_lookup()
+        benchmark_check_many()
+        benchmark_load_directory()
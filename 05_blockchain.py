@@ -40,61 +40,705 @@ Finally you need to link all of this together in a block chain, which you will b
 """
 
 import hashlib
+import io
+import json
+import mmap
+import multiprocessing
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+
+def encode_field(field):
+    field = str(field).encode("utf-8")
+    return f"{len(field)}:".encode("utf-8") + field
+
+
+def calc_header(timestamp, data, previous_hash, merkle_root=None, difficulty=None):
+    """
+    Bytes of the block contents which are hashed before the nonce. Every field is prefixed with
+    its length in bytes, so that different contents can never produce the same hashed string.
+
+    When the data is a list of transactions the header of the number of transactions and their Merkle root
+    is hashed instead of the data, so a transaction can be proven to be in the block without the others.
+    The Merkle root is calculated from the data if it is not given.
+    The difficulty is only part of the header of a proof of work block.
+    """
+    if isinstance(data, (list, tuple)):
+        if merkle_root is None:
+            merkle_root = calc_merkle_levels(data)[-1][0].hex()
+        fields = (timestamp, len(data), previous_hash, merkle_root)
+    else:
+        fields = (timestamp, data, previous_hash)
+    if difficulty is not None:
+        fields += (difficulty,)
+    return b"".join(encode_field(field) for field in fields)
+
+
+def calc_hash(timestamp, data, previous_hash, merkle_root=None, difficulty=0, nonce=None):
+    # SHA-256 of the header, followed by the nonce for a proof of work block
+    if nonce is None:
+        return hashlib.sha256(calc_header(timestamp, data, previous_hash, merkle_root)).hexdigest()
+    header = calc_header(timestamp, data, previous_hash, merkle_root, difficulty)
+    return hashlib.sha256(header + encode_field(nonce)).hexdigest()
+
+
+def meets_difficulty(block_hash, difficulty):
+    # The hash has to start with at least difficulty zero bits
+    return int(block_hash, 16) >> (256 - difficulty) == 0
+
+
+# Set in every mining worker process, so a worker stops once another one has found a nonce
+mining_stopped = None
+
+
+def init_miner(stopped):
+    global mining_stopped
+    mining_stopped = stopped
+
+
+def search_nonce(header, difficulty, start, stop):
+    """
+    First nonce in range(start, stop) giving a hash with difficulty leading zero bits, or None.
+
+    The header is hashed once and the hash state is copied for every nonce,
+    so only the nonce is hashed in the loop.
+    """
+    prefix = hashlib.sha256(header)
+    shift = 256 - difficulty
+    for nonce in range(start, stop):
+        if nonce & 4095 == 0 and mining_stopped is not None and mining_stopped.is_set():
+            return None
+        sha = prefix.copy()
+        sha.update(encode_field(nonce))
+        if int.from_bytes(sha.digest(), "big") >> shift == 0:
+            return nonce
+    return None
+
+
+class Miner:
+    """
+    Process pool searching for nonces in parallel, kept open so that mining many blocks
+    does not start new worker processes for every block.
+
+    The nonce space is split into ranges of chunk_size nonces which are searched by the workers.
+    When a worker finds a nonce the others are stopped and the ranges not yet started are cancelled,
+    and the pool is idle again before mine returns.
+    """
+
+    def __init__(self, workers, chunk_size=100000):
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.stopped = multiprocessing.Event()
+        self.executor = ProcessPoolExecutor(max_workers=workers, initializer=init_miner, initargs=(self.stopped,))
+
+    def __repr__(self):
+        return f"Miner: {self.workers} workers"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def mine(self, header, difficulty, max_nonce=2**64):
+        """
+        Time complexity: O(2^d / w)
+        expected, where d is the difficulty and w the number of workers
+        Space complexity: O(w)
+        for the ranges being searched
+
+        Returns:
+            nonce: the nonce found, or None if there is none below max_nonce
+        """
+        starts = iter(range(0, max_nonce, self.chunk_size))
+        pending = set()
+
+        def submit_next():
+            start = next(starts, None)
+            if start is not None:
+                pending.add(
+                    self.executor.submit(
+                        search_nonce, header, difficulty, start, min(start + self.chunk_size, max_nonce)
+                    )
+                )
+
+        for _ in range(self.workers * 2):
+            submit_next()
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    nonce = future.result()
+                    if nonce is not None:
+                        return nonce
+                    submit_next()
+            return None
+        finally:
+            # Stop the other ranges and wait for them, so the next block starts with an idle pool
+            self.stopped.set()
+            for future in pending:
+                future.cancel()
+            wait(pending)
+            self.stopped.clear()
+
+
+def mine_nonce(header, difficulty, workers=1, chunk_size=100000, max_nonce=2**64):
+    """
+    Searches for a nonce giving the block a hash with difficulty leading zero bits.
+    With more than one worker the search is split across a process pool, see Miner.
+
+    Time complexity: O(2^d / w)
+    expected, where d is the difficulty and w the number of workers
+    Space complexity: O(w)
+    for the ranges being searched
+
+    Returns:
+        nonce: the nonce found, or None if there is none below max_nonce
+    """
+    if workers <= 1:
+        return search_nonce(header, difficulty, 0, max_nonce)
+    with Miner(workers, chunk_size) as miner:
+        return miner.mine(header, difficulty, max_nonce)
+
+
+def calc_merkle_levels(transactions):
+    """
+    Levels of the Merkle tree of the transactions, from the leaf hashes up to the root.
+
+    Leaves and inner nodes are hashed with different prefixes, so an inner node can never pass as a
+    transaction. An unpaired last node is moved up to the next level unchanged.
+
+    Time complexity: O(n)
+    where n is the number of transactions, since there are fewer than 2n hashes
+    Space complexity: O(n)
+    for the hashes of every level
+    """
+    level = [hashlib.sha256(b"\x00" + str(transaction).encode("utf-8")).digest() for transaction in transactions]
+    if not level:
+        return [[hashlib.sha256(b"").digest()]]
+
+    levels = [level]
+    while len(level) > 1:
+        next_level = [hashlib.sha256(b"\x01" + level[i] + level[i + 1]).digest() for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            next_level.append(level[-1])
+        level = next_level
+        levels.append(level)
+    return levels
+
+
+def verify_proof(transaction, proof, merkle_root):
+    """
+    Return True if the proof from Block.proof shows the transaction is in the block with the Merkle root.
+
+    Time complexity: O(log n)
+    where n is the number of transactions in the block, one hash per level of the tree
+    Space complexity: O(1)
+    """
+    node = hashlib.sha256(b"\x00" + str(transaction).encode("utf-8")).digest()
+    for sibling, side in proof:
+        sibling = bytes.fromhex(sibling)
+        if side == "left":
+            node = hashlib.sha256(b"\x01" + sibling + node).digest()
+        else:
+            node = hashlib.sha256(b"\x01" + node + sibling).digest()
+    return node.hex() == merkle_root
+
+
+def has_proof_of_work(block_hash, difficulty, nonce, min_difficulty=0):
+    # A block needs at least the difficulty of its chain, a nonce if it has a difficulty, and a hash meeting it
+    if difficulty < min_difficulty or (difficulty and nonce is None):
+        return False
+    return meets_difficulty(block_hash, difficulty)
+
+
+def find_invalid_hash(blocks, min_difficulty=0):
+    # Offset of the first block whose stored hash does not match its contents or lacks the proof of work, or -1.
+    # Takes (timestamp, data, previous_hash, difficulty, nonce, hash) tuples so chunks can be sent to worker processes
+    for offset, (timestamp, data, previous_hash, difficulty, nonce, block_hash) in enumerate(blocks):
+        if calc_hash(timestamp, data, previous_hash, None, difficulty, nonce) != block_hash:
+            return offset
+        if not has_proof_of_work(block_hash, difficulty, nonce, min_difficulty):
+            return offset
+    return -1
 
 
 class Block:
-    def __init__(self, timestamp, data, previous_hash):
+    # Slots keep long chains compact, there is no per block __dict__
+    __slots__ = ("timestamp", "data", "previous_hash", "merkle_levels", "merkle_root", "difficulty", "nonce", "hash")
+
+    def __init__(self, timestamp, data, previous_hash, difficulty=0, nonce=None, workers=1, miner=None):
         self.timestamp = timestamp
         self.data = data
         self.previous_hash = previous_hash
-        self.hash = self.calc_hash()
+        # A block of a list of transactions keeps their Merkle tree for proofs
+        self.merkle_levels = None
+        self.merkle_root = None
+        if isinstance(data, (list, tuple)):
+            self.merkle_levels = calc_merkle_levels(data)
+            self.merkle_root = self.merkle_levels[-1][0].hex()
+        # A block with a difficulty is mined, unless its nonce is already known,
+        # by the miner if one is given so its process pool is reused
+        self.difficulty = difficulty
+        self.nonce = nonce
+        if difficulty and nonce is None:
+            header = calc_header(timestamp, data, previous_hash, self.merkle_root, difficulty)
+            if miner is not None:
+                self.nonce = miner.mine(header, difficulty)
+            else:
+                self.nonce = mine_nonce(header, difficulty, workers)
+        self.hash = calc_hash(timestamp, data, previous_hash, self.merkle_root, difficulty, self.nonce)
 
     def calc_hash(self):
         """
-        Time complexity: O(1)
-        since the generation of the hash is a constant time operation and is independent of the size of the data
-        Space complexity: O(1)
-        since the hash is a constant size
+        Time complexity: O(n)
+        where n is the size of the data, as the timestamp, data and previous hash are all hashed
+        Space complexity: O(n)
+        since the fields are encoded to bytes before hashing
+        """
+        return calc_hash(self.timestamp, self.data, self.previous_hash, None, self.difficulty, self.nonce)
+
+    def proof(self, tx_index):
+        """
+        Proof that the transaction at tx_index is in the block, a list of (sibling hash, side) pairs
+        from the leaf up to the root, to check with verify_proof.
+
+        Time complexity: O(log n)
+        where n is the number of transactions, one sibling per level of the tree
+        Space complexity: O(log n)
         """
-        sha = hashlib.sha256()
-        hash_str = "We are going to encode this string of data!".encode("utf-8")
-        sha.update(hash_str)
-        return sha.hexdigest()
+        if self.merkle_levels is None or not 0 <= tx_index < len(self.data):
+            return None
+
+        proof = []
+        index = tx_index
+        for level in self.merkle_levels[:-1]:
+            sibling = index ^ 1
+            # An unpaired last node has no sibling on this level
+            if sibling < len(level):
+                proof.append((level[sibling].hex(), "left" if sibling < index else "right"))
+            index //= 2
+        return proof
 
     def __repr__(self):
         return f"Block: {self.timestamp}, {self.data}, {self.hash}"
 
 
 class BlockChain:
-    def __init__(self):
+    def __init__(self, difficulty=0, workers=1):
         self.head = None
         self.tail = None
         self.entries = {}
         self.length = 0
+        # Proof of work difficulty in leading zero bits of the block hashes, and processes to mine with
+        self.difficulty = difficulty
+        self.workers = workers
+        # Process pool shared by every block mined with more than one worker, started on the first block
+        self.miner = None
+
+    def get_miner(self):
+        if self.miner is None and self.difficulty and self.workers > 1:
+            self.miner = Miner(self.workers)
+        return self.miner
+
+    def close(self):
+        # Stop the mining processes, they are started again if another block is mined
+        if self.miner is not None:
+            self.miner.close()
+            self.miner = None
 
     def append(self, timestamp, data):
         """
         Time complexity: O(1)
         since we are appending to the end of the linked list and are keeping track of the tail, so is a constant time operation
+        With a proof of work difficulty d, mining the block takes O(2^d / w) expected time with w workers
         Space complexity: O(n)
         where n is the number of entries in the blockchain
         """
         if self.head is None:
-            self.head = Block(timestamp, data, None)
+            self.head = Block(timestamp, data, None, self.difficulty, miner=self.get_miner())
             self.tail = self.head
         else:
             previous_hash = self.tail.hash
-            self.tail = Block(timestamp, data, previous_hash)
+            self.tail = Block(timestamp, data, previous_hash, self.difficulty, miner=self.get_miner())
         self.entries[self.length] = self.tail
         self.length += 1
 
+    def append_many(self, blocks):
+        """
+        Appends every (timestamp, data) pair of an iterable, which can be a generator,
+        keeping the tail and length in local variables until the end. If the iterable raises,
+        the blocks appended before the error are kept and the chain stays consistent.
+
+        Time complexity: O(k)
+        where k is the number of blocks appended
+        Space complexity: O(k)
+        for the new blocks
+
+        Returns:
+            the number of blocks appended
+        """
+        entries = self.entries
+        length = self.length
+        tail = self.tail
+        difficulty = self.difficulty
+        miner = self.get_miner()
+        try:
+            for timestamp, data in blocks:
+                tail = Block(timestamp, data, tail.hash if tail is not None else None, difficulty, miner=miner)
+                entries[length] = tail
+                length += 1
+                if self.head is None:
+                    self.head = tail
+        finally:
+            appended = length - self.length
+            self.tail = tail
+            self.length = length
+        return appended
+
+    def iter_blocks(self, start=0, end=None):
+        # Generator of the blocks from position start up to (not including) end, with the same meaning as in a slice
+        for position in range(*slice(start, end).indices(self.length)):
+            yield self.entries[position]
+
+    def export(self, file, start=0, end=None):
+        """
+        Writes the blocks from start up to (not including) end to a file object, one JSON object per line.
+        Blocks are written one at a time, so the export is never held in memory.
+
+        Time complexity: O(k)
+        where k is the number of blocks exported
+        Space complexity: O(1)
+        apart from the block being written
+
+        Returns:
+            the number of blocks exported
+        """
+        exported = 0
+        for block in self.iter_blocks(start, end):
+            record = {"timestamp": block.timestamp, "data": block.data, "previous_hash": block.previous_hash}
+            if block.nonce is not None:
+                record["difficulty"] = block.difficulty
+                record["nonce"] = block.nonce
+            record["hash"] = block.hash
+            file.write(json.dumps(record, default=str))
+            file.write("\n")
+            exported += 1
+        return exported
+
+    def verify(self, workers=1, chunk_size=10000):
+        """
+        Return True if every block's hash matches its contents and links to the previous block,
+        and every block was mined with at least the difficulty of the chain, False otherwise.
+
+        Recalculating the hashes is independent for every block once they are stored, so with more than
+        one worker the chain is split into chunks which are hashed in parallel by a process pool.
+        The chunks are checked in order and the check stops at the first broken block.
+
+        Time complexity: O(n / w)
+        where n is the number of blocks and w the number of workers, plus O(n) to check the links
+        Space complexity: O(n)
+        since the blocks are copied into chunks to send to the workers
+
+        Args:
+            workers: number of processes to hash with, the hashing is done in this process if 1
+            chunk_size: number of blocks per chunk sent to a worker
+        """
+        blocks = [self.entries[position] for position in range(self.length)]
+
+        def find_broken_link(start, end):
+            for position in range(max(start, 1), end):
+                if blocks[position].previous_hash != blocks[position - 1].hash:
+                    return position
+            return -1
+
+        def broken(position):
+            print("Block {} is invalid: {}".format(position, blocks[position]))
+            return False
+
+        if workers <= 1 or self.length <= chunk_size:
+            for position, block in enumerate(blocks):
+                if block.calc_hash() != block.hash:
+                    return broken(position)
+                if not has_proof_of_work(block.hash, block.difficulty, block.nonce, self.difficulty):
+                    return broken(position)
+                if position and block.previous_hash != blocks[position - 1].hash:
+                    return broken(position)
+            return True
+
+        starts = range(0, self.length, chunk_size)
+        chunks = (
+            [
+                (block.timestamp, block.data, block.previous_hash, block.difficulty, block.nonce, block.hash)
+                for block in blocks[start : start + chunk_size]
+            ]
+            for start in starts
+        )
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            invalid_offsets = executor.map(find_invalid_hash, chunks, [self.difficulty] * len(starts))
+            for start, invalid_offset in zip(starts, invalid_offsets):
+                end = min(start + chunk_size, self.length)
+                broken_link = find_broken_link(start, end)
+                invalid_hash = start + invalid_offset if invalid_offset != -1 else -1
+                if broken_link != -1 or invalid_hash != -1:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    return broken(min(position for position in (broken_link, invalid_hash) if position != -1))
+        return True
+
     def __repr__(self):
         return f"BlockChain: {self.entries}"
 
 
+class BlockStore:
+    """
+    Append-only block chain on disk, in a directory holding three files:
+
+    blocks.dat   the blocks, each a 4 byte length followed by the JSON of [timestamp, data, previous_hash],
+                 with the difficulty and nonce added for a mined block
+    heights.idx  the offset in blocks.dat of every block, 8 bytes per block in height order
+    hashes.idx   an open addressing hash table of (first 8 bytes of the block hash, height + 1) slots
+
+    Reads go through memory maps of the files, so looking up a block by height or hash reads just that
+    block instead of loading the chain. Writes are fsynced every sync_every blocks. The offsets of the
+    blocks appended since the last sync are kept in memory and only written to heights.idx once blocks.dat
+    has been fsynced, so heights.idx never points past the records on disk and its length is the number
+    of complete blocks. When the store is opened, heights whose record does not fit in blocks.dat are still
+    dropped in case the disk reordered the writes, anything past the last complete record is truncated,
+    and the hashes of the last batch are reinserted in case the hash table was not written.
+
+    The timestamp and data are stored as strings, or a list of strings for a block of transactions.
+    With a difficulty every appended block is mined first, as in BlockChain.
+    """
+
+    OFFSET = struct.Struct("<Q")
+    RECORD_LENGTH = struct.Struct("<I")
+    SLOT = struct.Struct("<QQ")
+    MIN_SLOTS = 1024
+
+    def __init__(self, directory, sync_every=1000, difficulty=0):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.sync_every = sync_every
+        self.difficulty = difficulty
+        self.unsynced = 0
+        self.data_map = None
+        self.heights_map = None
+
+        # Offsets of the blocks appended since the last sync, not yet written to heights.idx
+        self.pending_offsets = []
+
+        self.data_file = open(os.path.join(directory, "blocks.dat"), "a+b")
+        self.heights_file = open(os.path.join(directory, "heights.idx"), "a+b")
+        self.length = os.path.getsize(self.heights_file.name) // self.OFFSET.size
+        data_size = os.path.getsize(self.data_file.name)
+
+        # The data ends after the last indexed record which is complete in blocks.dat,
+        # records are contiguous so every record before it is complete too
+        self.data_end = 0
+        while self.length:
+            self.heights_file.seek((self.length - 1) * self.OFFSET.size)
+            last_offset = self.OFFSET.unpack(self.heights_file.read(self.OFFSET.size))[0]
+            if last_offset + self.RECORD_LENGTH.size <= data_size:
+                self.data_file.seek(last_offset)
+                last_length = self.RECORD_LENGTH.unpack(self.data_file.read(self.RECORD_LENGTH.size))[0]
+                if last_offset + self.RECORD_LENGTH.size + last_length <= data_size:
+                    self.data_end = last_offset + self.RECORD_LENGTH.size + last_length
+                    break
+            self.length -= 1
+        self.heights_file.truncate(self.length * self.OFFSET.size)
+        self.data_file.truncate(self.data_end)
+
+        self.open_hash_table()
+        self.tail = self.get_by_height(self.length - 1)
+        for height in range(max(0, self.length - sync_every), self.length):
+            self.insert_hash(self.get_by_height(height).hash, height)
+
+    def __repr__(self):
+        return f"BlockStore: {self.directory}, {self.length} blocks"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def open_hash_table(self):
+        path = os.path.join(self.directory, "hashes.idx")
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            with open(path, "wb") as hash_file:
+                hash_file.truncate(self.MIN_SLOTS * self.SLOT.size)
+        self.hash_file = open(path, "r+b")
+        self.hash_map = mmap.mmap(self.hash_file.fileno(), 0)
+        self.slots = len(self.hash_map) // self.SLOT.size
+
+    def insert_hash(self, block_hash, height):
+        """
+        Time complexity: O(1)
+        on average, the table is kept at most half full and SHA-256 hashes are uniformly distributed
+        Space complexity: O(1)
+        amortized, the table doubles when it is half full
+        """
+        if (self.length + 1) * 2 > self.slots:
+            self.grow_hash_table()
+        key = int.from_bytes(bytes.fromhex(block_hash)[:8], "little")
+        slot = key & (self.slots - 1)
+        while True:
+            stored_key, stored_height = self.SLOT.unpack_from(self.hash_map, slot * self.SLOT.size)
+            if stored_height == 0:
+                self.SLOT.pack_into(self.hash_map, slot * self.SLOT.size, key, height + 1)
+                return
+            if stored_key == key and stored_height == height + 1:
+                return
+            slot = (slot + 1) & (self.slots - 1)
+
+    def grow_hash_table(self):
+        # Write a table of double the size next to the old one, then replace it
+        path = os.path.join(self.directory, "hashes.idx")
+        slots = self.slots * 2
+        with open(path + ".tmp", "w+b") as new_file:
+            new_file.truncate(slots * self.SLOT.size)
+            new_map = mmap.mmap(new_file.fileno(), 0)
+            for old_slot in range(self.slots):
+                key, height = self.SLOT.unpack_from(self.hash_map, old_slot * self.SLOT.size)
+                if height == 0:
+                    continue
+                slot = key & (slots - 1)
+                while self.SLOT.unpack_from(new_map, slot * self.SLOT.size)[1] != 0:
+                    slot = (slot + 1) & (slots - 1)
+                self.SLOT.pack_into(new_map, slot * self.SLOT.size, key, height)
+            new_map.flush()
+            new_map.close()
+        self.hash_map.close()
+        self.hash_file.close()
+        os.replace(path + ".tmp", path)
+        self.open_hash_table()
+
+    def refresh_maps(self):
+        # The maps only cover the files as they were when mapped, remap them after appends
+        if self.data_map is None or len(self.data_map) < self.data_end:
+            self.data_file.flush()
+            if self.data_map is not None:
+                self.data_map.close()
+            self.data_map = mmap.mmap(self.data_file.fileno(), 0, access=mmap.ACCESS_READ)
+        heights_size = (self.length - len(self.pending_offsets)) * self.OFFSET.size
+        if heights_size and (self.heights_map is None or len(self.heights_map) < heights_size):
+            self.heights_file.flush()
+            if self.heights_map is not None:
+                self.heights_map.close()
+            self.heights_map = mmap.mmap(self.heights_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def append(self, timestamp, data):
+        """
+        Time complexity: O(n)
+        where n is the size of the data, amortized over the fsync batches and hash table growth,
+        plus O(2^d) expected to mine the block with a difficulty d
+        Space complexity: O(1)
+        since the block is written to disk and only the tail is kept in memory
+        """
+        previous_hash = self.tail.hash if self.tail is not None else None
+        if isinstance(data, (list, tuple)):
+            data = [str(transaction) for transaction in data]
+        else:
+            data = str(data)
+        block = Block(str(timestamp), data, previous_hash, self.difficulty)
+        fields = [block.timestamp, block.data, previous_hash]
+        if block.nonce is not None:
+            fields += [block.difficulty, block.nonce]
+        record = json.dumps(fields).encode("utf-8")
+
+        self.data_file.write(self.RECORD_LENGTH.pack(len(record)))
+        self.data_file.write(record)
+        self.pending_offsets.append(self.data_end)
+        self.insert_hash(block.hash, self.length)
+
+        self.data_end += self.RECORD_LENGTH.size + len(record)
+        self.length += 1
+        self.tail = block
+        self.unsynced += 1
+        if self.unsynced >= self.sync_every:
+            self.sync()
+        return block
+
+    def sync(self):
+        # The records reach the disk before the heights which point to them
+        self.data_file.flush()
+        os.fsync(self.data_file.fileno())
+        self.heights_file.write(b"".join(self.OFFSET.pack(offset) for offset in self.pending_offsets))
+        self.heights_file.flush()
+        os.fsync(self.heights_file.fileno())
+        self.pending_offsets = []
+        self.hash_map.flush()
+        self.unsynced = 0
+
+    def close(self):
+        self.sync()
+        for open_map in (self.data_map, self.heights_map, self.hash_map):
+            if open_map is not None:
+                open_map.close()
+        for open_file in (self.data_file, self.heights_file, self.hash_file):
+            open_file.close()
+
+    def get_by_height(self, height):
+        """
+        Return the block at the height, or None if there is no such block.
+
+        Time complexity: O(1)
+        since the offset of the block is at a fixed position in heights.idx
+        Space complexity: O(1)
+        apart from the block itself
+        """
+        if height < 0 or height >= self.length:
+            return None
+        self.refresh_maps()
+        synced_length = self.length - len(self.pending_offsets)
+        if height < synced_length:
+            offset = self.OFFSET.unpack_from(self.heights_map, height * self.OFFSET.size)[0]
+        else:
+            offset = self.pending_offsets[height - synced_length]
+        record_length = self.RECORD_LENGTH.unpack_from(self.data_map, offset)[0]
+        start = offset + self.RECORD_LENGTH.size
+        # timestamp, data, previous_hash, and the difficulty and nonce of a mined block
+        return Block(*json.loads(self.data_map[start : start + record_length]))
+
+    def get_by_hash(self, block_hash):
+        """
+        Return the block with the hash, or None if there is no such block.
+
+        Time complexity: O(1)
+        on average, as the hash table is probed from the slot of the hash
+        Space complexity: O(1)
+        apart from the block itself
+        """
+        try:
+            key = int.from_bytes(bytes.fromhex(block_hash)[:8], "little")
+        except (TypeError, ValueError):
+            return None
+        slot = key & (self.slots - 1)
+        while True:
+            stored_key, stored_height = self.SLOT.unpack_from(self.hash_map, slot * self.SLOT.size)
+            if stored_height == 0:
+                return None
+            # Only the first 8 bytes of the hash are stored, so confirm against the block
+            if stored_key == key and stored_height <= self.length:
+                block = self.get_by_height(stored_height - 1)
+                if block.hash == block_hash:
+                    return block
+            slot = (slot + 1) & (self.slots - 1)
+
+
 # Add your own test cases: include at least three test cases
 # and two of them must include edge cases, such as null, empty or very large values
 
+
 # Test Case 1
 # Test adding 3 blocks to the blockchain
 def test_01():
@@ -150,7 +794,405 @@ def test_03():
     print("Test 3 passed")
 
 
+# Test Case 4
+# Test that hashes depend on the contents and that verify finds changed blocks
+def test_04():
+    blockchain = BlockChain()
+    for i in range(100):
+        blockchain.append("2019-01-01 00:00:{:02d}".format(i % 60), "Block {}".format(i))
+
+    assert len({block.hash for block in blockchain.entries.values()}) == 100, "Test 04 Failed: hashes should differ"
+    assert blockchain.verify() == True, "Test 04 Failed: Blockchain should be valid"
+    assert blockchain.verify(workers=2, chunk_size=10) == True, "Test 04 Failed: Blockchain should be valid in parallel"
+
+    # Changing the data of a block without updating its hash
+    blockchain.entries[42].data = "Changed"
+    assert blockchain.verify() == False, "Test 04 Failed: Blockchain with a changed block should be invalid"
+    assert blockchain.verify(workers=2, chunk_size=10) == False, "Test 04 Failed: changed block found in parallel"
+
+    # Updating the hash as well breaks the link from the next block
+    blockchain.entries[42].hash = blockchain.entries[42].calc_hash()
+    assert blockchain.verify(workers=2, chunk_size=10) == False, "Test 04 Failed: broken link found in parallel"
+
+    assert BlockChain().verify() == True, "Test 04 Failed: empty Blockchain should be valid"
+
+    print("Test 4 passed")
+
+
+# Test Case 5
+# Test storing blocks on disk, reopening the store and looking blocks up by height and hash
+def test_05():
+    with tempfile.TemporaryDirectory() as directory:
+        with BlockStore(directory, sync_every=7) as store:
+            for i in range(3000):
+                store.append("2019-01-01", "Block {}".format(i))
+            block = store.get_by_height(1234)
+
+            assert block.data == "Block 1234", "Test 05 Failed: block 1234 should be 'Block 1234'"
+            assert block.previous_hash == store.get_by_height(1233).hash, "Test 05 Failed: block 1234 link"
+            assert store.get_by_hash(block.hash).data == "Block 1234", "Test 05 Failed: block 1234 by hash"
+            assert store.get_by_height(3000) is None, "Test 05 Failed: there is no block 3000"
+            assert store.get_by_hash("00" * 32) is None, "Test 05 Failed: unknown hash should not be found"
+
+        # A partly written block after the last complete one is dropped when reopening
+        with open(os.path.join(directory, "blocks.dat"), "ab") as data_file:
+            data_file.write(b"\x10\x00")
+
+        with BlockStore(directory) as store:
+            assert store.length == 3000, "Test 05 Failed: reopened store should have 3000 blocks"
+            assert store.get_by_hash(block.hash).data == "Block 1234", "Test 05 Failed: reopened block 1234 by hash"
+
+            appended = store.append("2019-01-02", "Block 3000")
+            assert appended.previous_hash == store.get_by_height(2999).hash, "Test 05 Failed: block 3000 link"
+            assert store.get_by_hash(appended.hash).data == "Block 3000", "Test 05 Failed: block 3000 by hash"
+
+    with tempfile.TemporaryDirectory() as directory:
+        with BlockStore(directory) as store:
+            assert store.length == 0 and store.tail is None, "Test 05 Failed: new store should be empty"
+            assert store.get_by_height(0) is None, "Test 05 Failed: new store has no block 0"
+
+    print("Test 5 passed")
+
+
+# Test Case 6
+# Test blocks of transactions with Merkle proofs
+def test_06():
+    blockchain = BlockChain()
+    blockchain.append("2019-01-01", "Block 0")
+    for count in [1, 2, 3, 7, 8, 100]:
+        transactions = ["tx {} of {}".format(i, count) for i in range(count)]
+        blockchain.append("2019-01-02", transactions)
+        block = blockchain.tail
+
+        for tx_index, transaction in enumerate(transactions):
+            proof = block.proof(tx_index)
+            assert verify_proof(transaction, proof, block.merkle_root) == True, "Test 06 Failed: proof should verify"
+            assert verify_proof("forged", proof, block.merkle_root) == False, "Test 06 Failed: forged transaction"
+        assert len(block.proof(count - 1)) <= count.bit_length(), "Test 06 Failed: proof should be O(log n)"
+
+    assert blockchain.verify() == True, "Test 06 Failed: Blockchain of transactions should be valid"
+    assert blockchain.entries[0].proof(0) is None, "Test 06 Failed: a block without transactions has no proofs"
+
+    # The block hash covers the transactions through the Merkle root
+    blockchain.tail.data[42] = "forged"
+    assert blockchain.verify() == False, "Test 06 Failed: changed transaction should be found"
+
+    with tempfile.TemporaryDirectory() as directory:
+        with BlockStore(directory) as store:
+            block = store.append("2019-01-01", ["a", "b", "c"])
+            assert store.get_by_hash(block.hash).merkle_root == block.merkle_root, "Test 06 Failed: stored Merkle root"
+
+    print("Test 6 passed")
+
+
+# Test Case 7
+# Test mining blocks with proof of work, in this process and in parallel
+def test_07():
+    for workers in [1, 2]:
+        blockchain = BlockChain(difficulty=10, workers=workers)
+        blockchain.append("2019-01-01", "Block 0")
+        miner = blockchain.miner
+        blockchain.append("2019-01-02", ["tx 0", "tx 1"])
+        blockchain.append_many([("2019-01-03", "Block 2")])
+        assert blockchain.miner is miner, "Test 07 Failed: every block should be mined by the same pool"
+        blockchain.close()
+
+        for block in blockchain.entries.values():
+            assert block.hash.startswith("00"), "Test 07 Failed: hash should start with 10 zero bits"
+            assert int(block.hash, 16) < 2**246, "Test 07 Failed: hash should start with 10 zero bits"
+        assert blockchain.verify() == True, "Test 07 Failed: mined Blockchain should be valid"
+
+    # A forged chain, rebuilt without any work but with valid hashes and links, fails the chain's difficulty
+    forged = BlockChain(difficulty=10)
+    previous_hash = None
+    for position in range(blockchain.length):
+        block = blockchain.entries[position]
+        forged.entries[position] = Block(block.timestamp, block.data, previous_hash)
+        previous_hash = forged.entries[position].hash
+    forged.head, forged.tail, forged.length = forged.entries[0], forged.entries[position], blockchain.length
+    assert forged.verify() == False, "Test 07 Failed: blocks without work should be rejected"
+    assert forged.verify(workers=2, chunk_size=1) == False, "Test 07 Failed: blocks without work rejected in parallel"
+
+    # A block claiming the difficulty without a nonce is rejected too
+    unmined = Block("2019-01-01", "Block 0", None)
+    unmined.difficulty = 10
+    unmined.hash = unmined.calc_hash()
+    forged.entries = {0: unmined}
+    forged.head, forged.tail, forged.length = unmined, unmined, 1
+    assert forged.verify() == False, "Test 07 Failed: a difficulty without a nonce should be rejected"
+    assert find_invalid_hash([("2019-01-01", "Block 0", None, 10, None, unmined.hash)]) == 0, "Test 07 Failed"
+
+    # Mined blocks keep their difficulty and nonce in a BlockStore
+    with tempfile.TemporaryDirectory() as directory:
+        with BlockStore(directory, difficulty=10) as store:
+            store.append("2019-01-01", "Block 0")
+            store.append("2019-01-02", "Block 1")
+        with BlockStore(directory, difficulty=10) as store:
+            stored = store.get_by_height(1)
+            assert stored.difficulty == 10 and stored.nonce is not None, "Test 07 Failed: stored nonce"
+            assert stored.calc_hash() == stored.hash and meets_difficulty(stored.hash, 10), "Test 07 Failed"
+            assert store.get_by_hash(stored.hash).nonce == stored.nonce, "Test 07 Failed: stored block by hash"
+
+    # Changing the nonce breaks the hash, and a block that was not mined fails the difficulty
+    blockchain.tail.nonce += 1
+    assert blockchain.verify() == False, "Test 07 Failed: changed nonce should be found"
+    blockchain.entries[1] = blockchain.tail = Block("2019-01-02", "Not mined", blockchain.head.hash, 10, nonce=0)
+    assert blockchain.verify() == meets_difficulty(blockchain.tail.hash, 10), "Test 07 Failed: difficulty check"
+
+    assert BlockChain().head is None and Block("2019-01-01", "Block", None).nonce is None, "Test 07 Failed: no nonce"
+
+    print("Test 7 passed")
+
+
+# Test Case 8
+# Test appending many blocks from a generator and exporting a range of them
+def test_08():
+    blockchain = BlockChain()
+    blockchain.append("2019-01-01", "Block 0")
+    appended = blockchain.append_many(("2019-01-02", "Block {}".format(i)) for i in range(1, 1000))
+
+    single = BlockChain()
+    for i in range(1000):
+        single.append("2019-01-01" if i == 0 else "2019-01-02", "Block {}".format(i))
+
+    assert appended == 999 and blockchain.length == 1000, "Test 08 Failed: Blockchain length should be 1000"
+    assert blockchain.tail.hash == single.tail.hash, "Test 08 Failed: append_many should match append"
+    assert blockchain.verify() == True, "Test 08 Failed: Blockchain should be valid"
+    assert BlockChain().append_many([]) == 0, "Test 08 Failed: nothing should be appended"
+
+    empty = BlockChain()
+    empty.append_many([("2019-01-01", "Block 0")])
+    assert empty.head is empty.tail and empty.head.previous_hash is None, "Test 08 Failed: first block is the head"
+
+    # Blocks before an error in the iterable are kept, and the chain can still be appended to
+    def failing_blocks():
+        for i in range(3):
+            yield "2019-01-01", "Block {}".format(i)
+        raise ValueError("export interrupted")
+
+    partial = BlockChain()
+    try:
+        partial.append_many(failing_blocks())
+        assert False, "Test 08 Failed: the error of the iterable should be raised"
+    except ValueError:
+        pass
+    assert partial.length == 3 and partial.tail.data == "Block 2", "Test 08 Failed: 3 blocks should be kept"
+    partial.append("2019-01-01", "Block 3")
+    assert partial.length == 4 and partial.verify() == True, "Test 08 Failed: partial chain should stay valid"
+
+    assert [block.data for block in blockchain.iter_blocks(998, 2000)] == [
+        "Block 998",
+        "Block 999",
+    ], "Test 08 Failed: iter_blocks should stop at the end of the Blockchain"
+    # Negative positions count from the end, like a slice
+    for start, end in [(-2, None), (0, -998), (-5, -3), (-2000, 2), (5, 3)]:
+        assert [block.data for block in blockchain.iter_blocks(start, end)] == [
+            "Block {}".format(i) for i in range(1000)[start:end]
+        ], "Test 08 Failed: iter_blocks({}, {}) should match the slice".format(start, end)
+    assert blockchain.export(io.StringIO(), -3) == 3, "Test 08 Failed: the last 3 blocks should be exported"
+
+    export = io.StringIO()
+    assert blockchain.export(export, 10, 20) == 10, "Test 08 Failed: 10 blocks should be exported"
+    lines = export.getvalue().splitlines()
+    assert len(lines) == 10, "Test 08 Failed: one line per block"
+    assert json.loads(lines[0])["hash"] == blockchain.entries[10].hash, "Test 08 Failed: exported hash"
+    assert json.loads(lines[-1])["data"] == "Block 19", "Test 08 Failed: exported data"
+
+    print("Test 8 passed")
+
+
+def append_and_exit(directory, count):
+    # Append blocks without syncing, then exit without closing the store, as if the writer was killed
+    store = BlockStore(directory, sync_every=10**9)
+    for i in range(count):
+        store.append("2019-01-01", "Block {}".format(i) * 20)
+    os._exit(0)
+
+
+# Test Case 9
+# Test reopening a store after the writer was killed, and after heights.idx reached the disk before blocks.dat
+def test_09():
+    with tempfile.TemporaryDirectory() as directory:
+        with BlockStore(directory, sync_every=100) as store:
+            for i in range(250):
+                store.append("2019-01-01", "Block {}".format(i))
+
+        writer = multiprocessing.Process(target=append_and_exit, args=(directory, 513))
+        writer.start()
+        writer.join()
+
+        # Only the blocks synced before the writer was killed are kept
+        with BlockStore(directory) as store:
+            assert store.length == 250, "Test 9 Failed: reopened store should have the 250 synced blocks"
+            assert store.get_by_height(249).data == "Block 249", "Test 9 Failed: block 249 should be kept"
+            appended = store.append("2019-01-02", "Block 250")
+            assert appended.previous_hash == store.get_by_height(249).hash, "Test 9 Failed: block 250 link"
+
+        # A height pointing past the end of blocks.dat, and one to a record cut short, are dropped
+        with open(os.path.join(directory, "blocks.dat"), "ab") as data_file:
+            data_file.write(BlockStore.RECORD_LENGTH.pack(100) + b"[")
+        data_size = os.path.getsize(os.path.join(directory, "blocks.dat"))
+        with open(os.path.join(directory, "heights.idx"), "ab") as heights_file:
+            heights_file.write(BlockStore.OFFSET.pack(data_size - 5) + BlockStore.OFFSET.pack(data_size + 1000))
+
+        with BlockStore(directory) as store:
+            assert store.length == 251, "Test 9 Failed: heights past the records should be dropped"
+            assert store.tail.data == "Block 250", "Test 9 Failed: block 250 should be the tail"
+            assert store.get_by_hash(appended.hash).data == "Block 250", "Test 9 Failed: block 250 by hash"
+
+    print("Test 9 passed")
+
+
+class BaselineBlock:
+    # Block as it was before __slots__, with a per block __dict__, kept to benchmark against
+    def __init__(self, timestamp, data, previous_hash):
+        self.timestamp = timestamp
+        self.data = data
+        self.previous_hash = previous_hash
+        self.merkle_levels = None
+        self.merkle_root = None
+        self.difficulty = 0
+        self.nonce = None
+        self.hash = calc_hash(timestamp, data, previous_hash)
+
+
+def baseline_append_all(blocks):
+    # Appends blocks one at a time the way BlockChain.append did before append_many, into an entries dictionary
+    entries = {}
+    tail = None
+    for timestamp, data in blocks:
+        tail = BaselineBlock(timestamp, data, tail.hash if tail is not None else None)
+        entries[len(entries)] = tail
+    return entries
+
+
+def benchmark_append_many(length=200000):
+    print("\nBenchmark - append and append_many of {} blocks:\n".format(length))
+
+    def generate_blocks():
+        return (("2019-01-01 00:00:00", "Block {}".format(i)) for i in range(length))
+
+    def build(method):
+        if method == "original":
+            return baseline_append_all(generate_blocks())
+        blockchain = BlockChain()
+        if method == "append":
+            for timestamp, data in generate_blocks():
+                blockchain.append(timestamp, data)
+        else:
+            blockchain.append_many(generate_blocks())
+        return blockchain
+
+    for method in ["original", "append", "append_many"]:
+        start = time.perf_counter()
+        build(method)
+        elapsed = time.perf_counter() - start
+
+        # Memory in a separate run, as tracing allocations slows it down
+        tracemalloc.start()
+        blockchain = build(method)
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(
+            "{:<12} {:.2f}us per block, {:.0f} bytes per block including its entry, hashes and data".format(
+                method, elapsed / length * 1e6, memory / length
+            )
+        )
+
+    start = time.perf_counter()
+    with tempfile.TemporaryFile("w") as export_file:
+        blockchain.export(export_file)
+    print("export       {:.2f}us per block".format((time.perf_counter() - start) / length * 1e6))
+
+
+def benchmark_mining(worker_counts=(1, 2, 4, 8), hashes=2 * 10**6):
+    print("\nBenchmark - proof of work hashes per second:\n")
+    header = calc_header("2019-01-01 00:00:00", "Block", "0" * 64, difficulty=256)
+    for workers in worker_counts:
+        # A difficulty no hash can meet, so every worker count tries exactly the same number of nonces
+        start = time.perf_counter()
+        mine_nonce(header, 256, workers=workers, max_nonce=hashes)
+        elapsed = time.perf_counter() - start
+        print("{} workers  {:,.0f} hashes/s".format(workers, hashes / elapsed))
+
+
+def benchmark_merkle(counts=(10, 100, 1000, 10000, 100000), proofs=1000):
+    print("\nBenchmark - Merkle root and proofs:\n")
+    for count in counts:
+        transactions = ["transaction {}".format(i) for i in range(count)]
+
+        start = time.perf_counter()
+        block = Block("2019-01-01", transactions, None)
+        root_time = time.perf_counter() - start
+
+        indexes = [random.randrange(count) for _ in range(proofs)]
+        block_proofs = [block.proof(index) for index in indexes]
+        start = time.perf_counter()
+        for index, proof in zip(indexes, block_proofs):
+            verify_proof(transactions[index], proof, block.merkle_root)
+        verify_time = (time.perf_counter() - start) / proofs
+
+        print(
+            "{:>7} transactions  root {:>9.2f}ms  proof of {:>2} hashes verified in {:.1f}us".format(
+                count, root_time * 1e3, len(block_proofs[0]), verify_time * 1e6
+            )
+        )
+
+
+def benchmark_block_store(length=10**6, lookups=10000):
+    print("\nBenchmark - block store of {} blocks:\n".format(length))
+    with tempfile.TemporaryDirectory() as directory:
+        with BlockStore(directory) as store:
+            start = time.perf_counter()
+            for i in range(length):
+                store.append("2019-01-01 00:00:00", "Block {}".format(i))
+            store.sync()
+            append_time = time.perf_counter() - start
+
+            heights = [random.randrange(length) for _ in range(lookups)]
+            start = time.perf_counter()
+            hashes = [store.get_by_height(height).hash for height in heights]
+            height_time = (time.perf_counter() - start) / lookups
+
+            start = time.perf_counter()
+            for block_hash in hashes:
+                store.get_by_hash(block_hash)
+            hash_time = (time.perf_counter() - start) / lookups
+
+            size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+    print("append         {:,.0f} blocks/s".format(length / append_time))
+    print("get_by_height  {:.1f}us".format(height_time * 1e6))
+    print("get_by_hash    {:.1f}us".format(hash_time * 1e6))
+    print("size on disk   {:.1f} MB".format(size / 1e6))
+
+
+def benchmark_verify(length=10**6, worker_counts=(1, 2, 4, 8), chunk_size=50000):
+    print("\nBenchmark - verifying {} blocks:\n".format(length))
+    blockchain = BlockChain()
+    for i in range(length):
+        blockchain.append("2019-01-01 00:00:00", "Block {}".format(i))
+
+    for workers in worker_counts:
+        start = time.perf_counter()
+        assert blockchain.verify(workers=workers, chunk_size=chunk_size) == True
+        elapsed = time.perf_counter() - start
+        print("{} workers  {:.2f}s  {:,.0f} blocks/s".format(workers, elapsed, length / elapsed))
+
+
 if __name__ == "__main__":
     test_01()
     test_02()
     test_03()
+    test_04()
+    test_05()
+    test_06()
+    test_07()
+    test_08()
+    test_09()
+    if "--benchmark" in sys.argv:
+        benchmark_verify()
+        benchmark_block_store()
+        benchmark_merkle()
+        benchmark_mining()
+        benchmark_append_many()
@@ -10,6 +10,17 @@ We have provided a code template below, you are not required to use it:
 
 """
 
+import heapq
+import os
+import pickle
+import sys
+import tempfile
+import time
+import tracemalloc
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+
 
 class Node:
     def __init__(self, value):
@@ -21,8 +32,14 @@ class Node:
 
 
 class LinkedList:
-    def __init__(self):
+    def __init__(self, iterable=None):
         self.head = None
+        # Keep track of the tail and length so append and size are O(1)
+        self.tail = None
+        self.length = 0
+        if iterable is not None:
+            for value in iterable:
+                self.append(value)
 
     def __str__(self):
         cur_head = self.head
@@ -32,87 +49,478 @@ class LinkedList:
             cur_head = cur_head.next
         return out_string
 
-    def append(self, value):
-
-        if self.head is None:
-            self.head = Node(value)
-            return
-
+    def __iter__(self):
+        # Iterate over the values without changing the list
         node = self.head
-        while node.next:
+        while node:
+            yield node.value
             node = node.next
 
-        node.next = Node(value)
+    def append(self, value):
+        """
+        Time complexity: O(1)
+        since the new node is linked after the tail
+        Space complexity: O(1)
+        """
+        node = Node(value)
+        if self.head is None:
+            self.head = node
+        else:
+            self.tail.next = node
+        self.tail = node
+        self.length += 1
 
     def size(self):
-        size = 0
-        node = self.head
-        while node:
-            size += 1
-            node = node.next
-
-        return size
+        return self.length
 
     def as_list(self):
-        out_list = []
-        node = self.head
-        while node:
-            out_list.append(node.value)
-            node = node.next
-
-        return out_list
+        return list(self)
 
 
 def union(llist_1, llist_2):
     """
-    Find the union of two linked lists
+    Find the union of two linked lists, without changing them
 
     Time complexity: O(n + m)
-    Because we are iterating through both linked lists,
-    and also using a hash table and iterating through it, the time complexity is O(n + m + k)
-    Space complexity: O(n + m + k)
-    This is worst case only as we don't know the size of the union
+    Because we are iterating through both linked lists once each, and appending each of the
+    k unique values to the union is O(1), the time complexity is O(n + m + k)
+    Space complexity: O(k)
+    where k is the number of unique values, for the hash table and the union
 
     return: A linked list containing the union of the two linked lists
     """
     hash_table = {}
-    union_list = LinkedList()
-    while llist_1.head:
-        hash_table[llist_1.head.value] = 1
-        llist_1.head = llist_1.head.next
-    while llist_2.head:
-        hash_table[llist_2.head.value] = 1
-        llist_2.head = llist_2.head.next
-    for key in hash_table:
-        union_list.append(key)
-    return union_list
+    for value in llist_1:
+        hash_table[value] = 1
+    for value in llist_2:
+        hash_table[value] = 1
+    return LinkedList(hash_table)
 
 
 def intersection(llist_1, llist_2):
     """
-    Find the intersection of two linked lists
+    Find the intersection of two linked lists, without changing them
 
     Time complexity: O(n + m)
-    Because we are iterating through both linked lists,
-    and also using a hash table and iterating through it, the time complexity is O(n + m + k1 + k2)
-    Space complexity: O(n + m + k1 + k2)
+    Because we are iterating through both linked lists once each, and appending each value
+    of the intersection is O(1)
+    Space complexity: O(n + m)
     This is worst case only as we don't know the size of the intersection
 
     return: A linked list containing the intersection of the two linked lists
     """
     hash_list_1 = {}
     hash_list_2 = {}
-    intersection_list = LinkedList()
-    while llist_1.head:
-        hash_list_1[llist_1.head.value] = 1
-        llist_1.head = llist_1.head.next
-    while llist_2.head:
-        hash_list_2[llist_2.head.value] = 1
-        llist_2.head = llist_2.head.next
-    for key in hash_list_1:
-        if key in hash_list_2:
-            intersection_list.append(key)
-    return intersection_list
+    for value in llist_1:
+        hash_list_1[value] = 1
+    for value in llist_2:
+        hash_list_2[value] = 1
+    return LinkedList(key for key in hash_list_1 if key in hash_list_2)
+
+
+def sorted_values(llist):
+    # Sorted inputs can be linked lists or Python sequences, random access is needed for galloping
+    if isinstance(llist, LinkedList):
+        return llist.as_list()
+    return llist
+
+
+def sorted_union(llist_1, llist_2):
+    """
+    Find the union of two sorted linked lists (or sorted lists) by merging them
+
+    Time complexity: O(n + m)
+    since every element of both lists is looked at once, without hashing
+    Space complexity: O(k)
+    where k is the size of the union
+
+    return: A sorted linked list containing the union of the two lists, without duplicates
+    """
+    union_list = LinkedList()
+    for value in heapq.merge(llist_1, llist_2):
+        if union_list.tail is None or union_list.tail.value != value:
+            union_list.append(value)
+    return union_list
+
+
+def gallop_intersection(values_1, values_2):
+    """
+    Intersection of two sorted Python lists, as a sorted Python list without duplicates.
+
+    Each value of the smaller list is searched for in the larger one starting from the previous match,
+    doubling the step until it is passed and then binary searching the last step (exponential search).
+
+    Time complexity: O(n log(m / n))
+    where n is the size of the smaller list and m the size of the larger one
+    Space complexity: O(n)
+    for the intersection
+    """
+    if len(values_1) > len(values_2):
+        values_1, values_2 = values_2, values_1
+
+    result = []
+    position = 0
+    length = len(values_2)
+    for value in values_1:
+        if result and result[-1] == value:
+            continue
+        step = 1
+        while position + step < length and values_2[position + step] < value:
+            step *= 2
+        position = bisect_left(values_2, value, position + step // 2, min(position + step + 1, length))
+        if position == length:
+            break
+        if values_2[position] == value:
+            result.append(value)
+    return result
+
+
+def sorted_intersection(llist_1, llist_2):
+    """
+    Find the intersection of two sorted linked lists (or sorted lists) by galloping through the larger one
+
+    Time complexity: O(n log(m / n))
+    where n is the size of the smaller list and m the size of the larger one,
+    plus O(n + m) to copy linked lists into Python lists for random access
+    Space complexity: O(n)
+    for the intersection
+
+    return: A sorted linked list containing the intersection of the two lists, without duplicates
+    """
+    return LinkedList(gallop_intersection(sorted_values(llist_1), sorted_values(llist_2)))
+
+
+def k_way_union(llists):
+    """
+    Find the union of many sorted linked lists (or sorted lists) with a heap of their heads
+
+    Time complexity: O(t log k)
+    where t is the total number of elements and k the number of lists
+    Space complexity: O(k + u)
+    for the heap and the u elements of the union
+
+    return: A sorted linked list containing the union of the lists, without duplicates
+    """
+    union_list = LinkedList()
+    for value in heapq.merge(*llists):
+        if union_list.tail is None or union_list.tail.value != value:
+            union_list.append(value)
+    return union_list
+
+
+def k_way_intersection(llists):
+    """
+    Find the intersection of many sorted linked lists (or sorted lists), smallest list first
+
+    Intersecting the smallest lists first keeps the running intersection small, and it can only shrink,
+    so each following list is galloped through with the fewest searches.
+
+    Time complexity: O(k * s log(m / s))
+    where s is the size of the smallest list, m the size of the largest and k the number of lists
+    Space complexity: O(s)
+    for the running intersection
+
+    return: A sorted linked list containing the intersection of the lists, without duplicates
+    """
+    values = sorted((sorted_values(llist) for llist in llists), key=len)
+    if not values:
+        return LinkedList()
+
+    result = gallop_intersection(values[0], values[0])
+    for other in values[1:]:
+        if not result:
+            break
+        result = gallop_intersection(result, other)
+    return LinkedList(result)
+
+
+class RoaringBitmap:
+    """
+    Compressed set of unsigned 32 bit integers.
+
+    Values are split by their high 16 bits into chunks of 65536 possible values, each stored in a container:
+    an array container is a sorted array of the low 16 bits (2 bytes per value) and is used for up to
+    ARRAY_MAX values, above that a bitmap container is a Python int of 65536 bits (8 KB) with the bit of
+    every low 16 bits set. Set operations work chunk by chunk, bitmap containers with bitwise operations
+    on whole machine words.
+    """
+
+    ARRAY_MAX = 4096
+    CHUNK_BITS = 65536
+
+    def __init__(self, iterable=None):
+        # High 16 bits to container, an array("H") or an int
+        self.containers = {}
+        if iterable is not None:
+            chunks = {}
+            for value in iterable:
+                if not 0 <= value < 2**32:
+                    raise ValueError("RoaringBitmap values must be unsigned 32 bit integers, not {}".format(value))
+                chunks.setdefault(value >> 16, []).append(value & 0xFFFF)
+            for high, lows in chunks.items():
+                self.containers[high] = self.make_container(lows)
+
+    def __repr__(self):
+        return f"RoaringBitmap({len(self)} values in {len(self.containers)} containers)"
+
+    @classmethod
+    def from_linked_list(cls, llist):
+        return cls(llist)
+
+    def to_linked_list(self):
+        return LinkedList(self)
+
+    def make_container(self, lows):
+        # Container of the smallest kind for the low 16 bits, which can be unsorted and repeated
+        lows = set(lows)
+        if len(lows) <= self.ARRAY_MAX:
+            return array("H", sorted(lows))
+        bits = bytearray(self.CHUNK_BITS // 8)
+        for low in lows:
+            bits[low >> 3] |= 1 << (low & 7)
+        return int.from_bytes(bits, "little")
+
+    def to_bitmap(self, container):
+        if isinstance(container, int):
+            return container
+        bits = bytearray(self.CHUNK_BITS // 8)
+        for low in container:
+            bits[low >> 3] |= 1 << (low & 7)
+        return int.from_bytes(bits, "little")
+
+    def optimize(self, bitmap):
+        # A bitmap container with few values left is stored as an array container, an empty one not at all
+        count = bitmap.bit_count()
+        if count == 0:
+            return None
+        if count > self.ARRAY_MAX:
+            return bitmap
+        lows = array("H")
+        while bitmap:
+            lowest = bitmap & -bitmap
+            lows.append(lowest.bit_length() - 1)
+            bitmap ^= lowest
+        return lows
+
+    def __len__(self):
+        return sum(
+            container.bit_count() if isinstance(container, int) else len(container)
+            for container in self.containers.values()
+        )
+
+    def __contains__(self, value):
+        container = self.containers.get(value >> 16) if isinstance(value, int) and 0 <= value < 2**32 else None
+        if container is None:
+            return False
+        low = value & 0xFFFF
+        if isinstance(container, int):
+            return container >> low & 1 == 1
+        position = bisect_left(container, low)
+        return position < len(container) and container[position] == low
+
+    def __iter__(self):
+        # Values in ascending order
+        for high in sorted(self.containers):
+            container = self.containers[high]
+            if isinstance(container, int):
+                bits = container.to_bytes(self.CHUNK_BITS // 8, "little")
+                for byte_index, byte in enumerate(bits):
+                    while byte:
+                        lowest = byte & -byte
+                        yield high << 16 | byte_index << 3 | lowest.bit_length() - 1
+                        byte ^= lowest
+            else:
+                for low in container:
+                    yield high << 16 | low
+
+    def combine(self, other, operation):
+        """
+        Time complexity: O(c * w)
+        where c is the number of containers and w the size of a container, 1024 words for bitmaps
+        or up to ARRAY_MAX values for arrays
+        Space complexity: O(c * w)
+        for the containers of the result
+        """
+        result = RoaringBitmap()
+        if operation == "union":
+            highs = self.containers.keys() | other.containers.keys()
+        elif operation == "intersection":
+            highs = self.containers.keys() & other.containers.keys()
+        else:
+            highs = self.containers.keys()
+
+        for high in highs:
+            first = self.containers.get(high)
+            second = other.containers.get(high)
+            if first is None or second is None:
+                # Only a union or difference gets here, the container is copied unchanged
+                container = first if first is not None else second
+                result.containers[high] = container if isinstance(container, int) else array("H", container)
+                continue
+
+            if not isinstance(first, int) and not isinstance(second, int):
+                if operation == "union":
+                    container = self.make_container(heapq.merge(first, second))
+                elif operation == "intersection":
+                    container = array("H", gallop_intersection(first, second)) or None
+                else:
+                    second_set = set(second)
+                    container = array("H", (low for low in first if low not in second_set)) or None
+            elif operation == "intersection" and not isinstance(first, int):
+                container = array("H", (low for low in first if second >> low & 1)) or None
+            elif operation == "intersection" and not isinstance(second, int):
+                container = array("H", (low for low in second if first >> low & 1)) or None
+            elif operation == "union":
+                container = self.to_bitmap(first) | self.to_bitmap(second)
+            elif operation == "intersection":
+                container = self.optimize(first & second)
+            else:
+                container = self.optimize(self.to_bitmap(first) & ~self.to_bitmap(second))
+
+            if container is not None:
+                result.containers[high] = container
+        return result
+
+    def union(self, other):
+        return self.combine(other, "union")
+
+    def intersection(self, other):
+        return self.combine(other, "intersection")
+
+    def difference(self, other):
+        return self.combine(other, "difference")
+
+    __or__ = union
+    __and__ = intersection
+    __sub__ = difference
+
+    def memory_size(self):
+        # Bytes used by the containers and the dictionary holding them
+        return sys.getsizeof(self.containers) + sum(sys.getsizeof(container) for container in self.containers.values())
+
+
+# 2^64 divided by the golden ratio, an odd constant which spreads consecutive and strided hashes apart
+HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+
+
+def partition_of(value, partitions):
+    """
+    Partition of a value, from 0 to partitions - 1.
+
+    hash() of an int is the int itself, so taking it modulo the number of partitions would put ids
+    in multiples of the partition count all in one partition. The hash is mixed first by multiplying
+    with an odd constant (Fibonacci hashing), and the high bits of the 64 bit product are scaled
+    to the number of partitions, which does not need to be a power of two.
+    """
+    mixed = (hash(value) * HASH_MULTIPLIER) & 0xFFFFFFFFFFFFFFFF
+    return (mixed * partitions) >> 64
+
+
+def read_spill_file(path):
+    # Values of a spill file, which is a sequence of pickled lists
+    with open(path, "rb") as spill_file:
+        while True:
+            try:
+                yield from pickle.load(spill_file)
+            except EOFError:
+                return
+
+
+def combine_partition(paths, operation, result_path):
+    """
+    Union or intersection of one partition of every input, written to result_path.
+    Runs in a worker process, only one partition of the inputs is held in memory.
+
+    Returns:
+        the number of values written
+    """
+    if operation == "union":
+        result = set()
+        for path in paths:
+            result.update(read_spill_file(path))
+    else:
+        result = None
+        for path in paths:
+            values = set(read_spill_file(path))
+            result = values if result is None else result & values
+            if not result:
+                break
+
+    with open(result_path, "wb") as result_file:
+        if result:
+            pickle.dump(list(result), result_file, pickle.HIGHEST_PROTOCOL)
+    return len(result or ())
+
+
+def partitioned_set_operation(iterables, operation, partitions=64, workers=1, directory=None, batch_size=1024):
+    """
+    Union or intersection of inputs which do not fit in memory.
+
+    Every input is read once and its values are hash partitioned into spill files on disk, written in
+    batches, so equal values of all inputs end up in the same partition. Each partition is then
+    combined on its own, in parallel by a process pool if there is more than one worker, and the results
+    are streamed back one partition at a time. Values must be hashable and picklable, and come out grouped
+    by partition rather than in input order.
+
+    Time complexity: O(t)
+    where t is the total number of input values, each is written, read and hashed a constant number of times
+    Space complexity: O(p * b + t / p)
+    in memory, for p partitions of b buffered values while spilling and one partition while combining,
+    plus O(t) on disk
+    """
+    iterables = list(iterables)
+    with tempfile.TemporaryDirectory(dir=directory) as spill_directory:
+        paths = [[] for _ in range(partitions)]
+        for input_index, iterable in enumerate(iterables):
+            files = []
+            buffers = [[] for _ in range(partitions)]
+            for partition in range(partitions):
+                path = os.path.join(spill_directory, "input{}_partition{}".format(input_index, partition))
+                paths[partition].append(path)
+                files.append(open(path, "wb"))
+            try:
+                for value in iterable:
+                    partition = partition_of(value, partitions)
+                    buffer = buffers[partition]
+                    buffer.append(value)
+                    if len(buffer) >= batch_size:
+                        pickle.dump(buffer, files[partition], pickle.HIGHEST_PROTOCOL)
+                        buffer.clear()
+                for spill_file, buffer in zip(files, buffers):
+                    if buffer:
+                        pickle.dump(buffer, spill_file, pickle.HIGHEST_PROTOCOL)
+            finally:
+                for spill_file in files:
+                    spill_file.close()
+
+        if not iterables:
+            return
+        result_paths = [os.path.join(spill_directory, "result{}".format(partition)) for partition in range(partitions)]
+        arguments = (paths, [operation] * partitions, result_paths)
+        if workers <= 1:
+            counts = map(combine_partition, *arguments)
+            for result_path, _ in zip(result_paths, counts):
+                yield from read_spill_file(result_path)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for result_path, _ in zip(result_paths, executor.map(combine_partition, *arguments)):
+                    yield from read_spill_file(result_path)
+
+
+def partitioned_union(iterables, partitions=64, workers=1, directory=None):
+    """
+    Generator of the union of any number of iterables, which can be larger than memory,
+    see partitioned_set_operation.
+    """
+    return partitioned_set_operation(iterables, "union", partitions, workers, directory)
+
+
+def partitioned_intersection(iterables, partitions=64, workers=1, directory=None):
+    """
+    Generator of the intersection of any number of iterables, which can be larger than memory,
+    see partitioned_set_operation.
+    """
+    return partitioned_set_operation(iterables, "intersection", partitions, workers, directory)
 
 
 # Default test case 1
@@ -256,9 +664,322 @@ def test_03():
     print("Test case 03 Passed")
 
 
+# Test Case 4
+# Test that union and intersection leave their inputs unchanged, and the O(1) size
+def test_04():
+    linked_list_1 = LinkedList([3, 2, 4, 35, 6, 65, 6, 4, 3, 21])
+    linked_list_2 = LinkedList([6, 32, 4, 9, 6, 1, 11, 21, 1])
+
+    union_result = union(linked_list_1, linked_list_2)
+    intersection_result = intersection(linked_list_1, linked_list_2)
+
+    assert union_result.as_list() == [3, 2, 4, 35, 6, 65, 21, 32, 9, 1, 11], "Test case 04 Failed: Union is incorrect"
+    assert intersection_result.as_list() == [4, 6, 21], "Test case 04 Failed: Intersection is incorrect"
+    assert linked_list_1.as_list() == [3, 2, 4, 35, 6, 65, 6, 4, 3, 21], "Test case 04 Failed: list 1 was changed"
+    assert linked_list_2.size() == 9, "Test case 04 Failed: list 2 was changed"
+    assert union_result.size() == 11, "Test case 04 Failed: Union size is incorrect"
+
+    union_result.append(100)
+    assert union_result.tail.value == 100 and union_result.size() == 12, "Test case 04 Failed: append after union"
+
+    print("Test case 04 Passed")
+
+
+# Test Case 5
+# Test the sorted variants against the hash based union and intersection
+def test_05():
+    linked_list_1 = LinkedList([1, 2, 2, 4, 8, 16, 32, 64, 128])
+    linked_list_2 = LinkedList([2, 3, 4, 5, 64, 64, 200])
+    lists = [
+        list(range(0, 1000, 2)),
+        list(range(0, 1000, 3)),
+        [0, 6, 12, 500, 600, 996, 999],
+        list(range(0, 1000, 6)),
+    ]
+
+    assert sorted_union(linked_list_1, linked_list_2).as_list() == sorted(
+        union(linked_list_1, linked_list_2).as_list()
+    ), "Test case 05 Failed: Sorted union is incorrect"
+    assert sorted_intersection(linked_list_1, linked_list_2).as_list() == [
+        2,
+        4,
+        64,
+    ], "Test case 05 Failed: Sorted intersection is incorrect"
+    assert (
+        sorted_intersection(LinkedList(), linked_list_2).as_list() == []
+    ), "Test case 05 Failed: Sorted intersection with an empty list should be empty"
+    assert sorted_intersection([5], list(range(100000))).as_list() == [
+        5
+    ], "Test case 05 Failed: Sorted intersection of uneven lists is incorrect"
+
+    expected_union = sorted(set().union(*lists))
+    expected_intersection = sorted(set(lists[0]).intersection(*lists[1:]))
+    assert k_way_union(lists).as_list() == expected_union, "Test case 05 Failed: k-way union is incorrect"
+    assert (
+        k_way_intersection(lists).as_list() == expected_intersection == [0, 6, 12, 600, 996]
+    ), "Test case 05 Failed: k-way intersection is incorrect"
+    assert k_way_intersection([]).as_list() == [], "Test case 05 Failed: k-way intersection of no lists"
+
+    print("Test case 05 Passed")
+
+
+# Test Case 6
+# Test the compressed bitmap against Python sets, with sparse and dense chunks
+def test_06():
+    values_1 = list(range(0, 200000, 3)) + [2**32 - 1, 5 * 2**16 + 7, 70000, 70000]
+    values_2 = list(range(100000, 300000, 2)) + list(range(2**20, 2**20 + 100)) + [5 * 2**16 + 7]
+    bitmap_1 = RoaringBitmap(values_1)
+    bitmap_2 = RoaringBitmap.from_linked_list(LinkedList(values_2))
+
+    assert len(bitmap_1) == len(set(values_1)), "Test case 06 Failed: length is incorrect"
+    assert 2**32 - 1 in bitmap_1 and 1 not in bitmap_1 and -1 not in bitmap_1, "Test case 06 Failed: contains"
+    assert list(bitmap_1) == sorted(set(values_1)), "Test case 06 Failed: values should iterate in order"
+    assert bitmap_2.to_linked_list().as_list() == sorted(set(values_2)), "Test case 06 Failed: to_linked_list"
+
+    assert list(bitmap_1 | bitmap_2) == sorted(set(values_1) | set(values_2)), "Test case 06 Failed: union"
+    assert list(bitmap_1 & bitmap_2) == sorted(set(values_1) & set(values_2)), "Test case 06 Failed: intersection"
+    assert list(bitmap_1 - bitmap_2) == sorted(set(values_1) - set(values_2)), "Test case 06 Failed: difference"
+    assert list(bitmap_2 - bitmap_1) == sorted(set(values_2) - set(values_1)), "Test case 06 Failed: difference"
+
+    assert len(RoaringBitmap() & bitmap_1) == 0, "Test case 06 Failed: intersection with an empty bitmap"
+    try:
+        RoaringBitmap([-1])
+        assert False, "Test case 06 Failed: negative values should not be accepted"
+    except ValueError:
+        pass
+
+    print("Test case 06 Passed")
+
+
+# Test Case 7
+# Test the partitioned union and intersection of generators, in this process and in parallel
+def test_07():
+    def inputs():
+        return [
+            (i * 3 for i in range(20000)),
+            (i * 5 for i in range(20000)),
+            LinkedList(["a", "b", "c", 0, 15, 30, 45, "a"]),
+        ]
+
+    expected_union = set(range(0, 60000, 3)) | set(range(0, 100000, 5)) | {"a", "b", "c"}
+    expected_intersection = {0, 15, 30, 45}
+
+    for workers in [1, 2]:
+        union_result = list(partitioned_union(inputs(), partitions=8, workers=workers))
+        intersection_result = list(partitioned_intersection(inputs(), partitions=8, workers=workers))
+
+        assert len(union_result) == len(expected_union), "Test case 07 Failed: Union should not repeat values"
+        assert set(union_result) == expected_union, "Test case 07 Failed: Union is incorrect"
+        assert sorted(intersection_result) == sorted(expected_intersection), "Test case 07 Failed: Intersection"
+
+    # Strided ids are spread evenly, rather than all landing in the partitions their stride divides
+    for stride in [1, 64, 1000, 1024, 2**32]:
+        sizes = [0] * 64
+        for value in range(0, 64000 * stride, stride):
+            sizes[partition_of(value, 64)] += 1
+        assert max(sizes) < 2 * 1000 and min(sizes) > 1000 // 2, "Test case 07 Failed: stride {} is unbalanced".format(
+            stride
+        )
+    assert {partition_of(value, 7) for value in range(1000)} == set(range(7)), "Test case 07 Failed: 7 partitions"
+
+    assert list(partitioned_union([])) == [], "Test case 07 Failed: Union of no inputs should be empty"
+    assert list(partitioned_intersection([[], [1]])) == [], "Test case 07 Failed: Intersection with empty input"
+
+    print("Test case 07 Passed")
+
+
+def benchmark_partitioned(sizes=(10**5, 10**6), worker_counts=(1, 2, 4), partitions=64):
+    print("\nBenchmark - partitioned union and intersection of two generated inputs:\n")
+    for size in sizes:
+        for workers in worker_counts:
+            tracemalloc.start()
+            start = time.perf_counter()
+            count = 0
+            for _ in partitioned_intersection(
+                [range(size), range(size // 2, size + size // 2)], partitions=partitions, workers=workers
+            ):
+                count += 1
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(
+                "{:>9} values per input, {} workers  intersection of {} in {:.2f}s, peak memory {:.1f} MB".format(
+                    size, workers, count, elapsed, peak / 1e6
+                )
+            )
+
+
+def benchmark_roaring(size=10**7):
+    print("\nBenchmark - compressed bitmap against dictionaries of {} values:\n".format(size))
+    distributions = {
+        "dense": (range(0, 2 * size, 2), range(size, 3 * size, 2)),
+        "sparse": (range(0, 300 * size, 300), range(0, 420 * size, 420)),
+    }
+    for name, (values_1, values_2) in distributions.items():
+        tracemalloc.start()
+        hash_table = dict.fromkeys(values_1, 1)
+        dict_memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del hash_table
+
+        bitmap_1 = RoaringBitmap(values_1)
+        bitmap_2 = RoaringBitmap(values_2)
+
+        start = time.perf_counter()
+        hash_list_1 = dict.fromkeys(values_1, 1)
+        hash_list_2 = dict.fromkeys(values_2, 1)
+        [key for key in hash_list_1 if key in hash_list_2]
+        dict_time = time.perf_counter() - start
+        del hash_list_1, hash_list_2
+
+        timings = []
+        for operation in [bitmap_1.union, bitmap_1.intersection, bitmap_1.difference]:
+            start = time.perf_counter()
+            operation(bitmap_2)
+            timings.append(time.perf_counter() - start)
+
+        print(
+            "{:<7} memory per value: dict {:.1f} bytes, bitmap {:.2f} bytes".format(
+                name, dict_memory / size, bitmap_1.memory_size() / size
+            )
+        )
+        print(
+            "{:<7} dict intersection {:.1f}M values/s, bitmap union {:.1f}M, intersection {:.1f}M, "
+            "difference {:.1f}M values/s".format(
+                name, 2 * size / dict_time / 1e6, *(2 * size / t / 1e6 for t in timings)
+            )
+        )
+
+
+def benchmark_sorted(large=10**6, ratios=(1, 10, 100, 1000, 10000)):
+    print("\nBenchmark - hash based against sorted union and intersection, {} element list:\n".format(large))
+    large_values = list(range(0, 2 * large, 2))
+    for ratio in ratios:
+        step = 2 * ratio
+        small_values = list(range(1, 2 * large, step))[: large // ratio]
+        # Every other small value is in the large list
+        small_values = [value - (index % 2) for index, value in enumerate(small_values)]
+
+        timings = []
+        for function in [union, sorted_union, intersection, sorted_intersection]:
+            start = time.perf_counter()
+            function(small_values, large_values)
+            timings.append(time.perf_counter() - start)
+
+        print(
+            "1:{:<6}  union {:.3f}s  sorted union {:.3f}s  intersection {:.4f}s  sorted intersection {:.4f}s".format(
+                ratio, *timings
+            )
+        )
+
+
+class BaselineLinkedList:
+    # The original linked list, whose append walks to the end of the list, kept to benchmark against
+    def __init__(self, iterable=()):
+        self.head = None
+        # The inputs are linked directly, so that building them is not quadratic too
+        previous = None
+        for value in iterable:
+            node = Node(value)
+            if previous is None:
+                self.head = node
+            else:
+                previous.next = node
+            previous = node
+
+    def append(self, value):
+
+        if self.head is None:
+            self.head = Node(value)
+            return
+
+        node = self.head
+        while node.next:
+            node = node.next
+
+        node.next = Node(value)
+
+
+def baseline_union(llist_1, llist_2):
+    # The original union, O((n + m) * k) for a union of k values as every append walks the result
+    hash_table = {}
+    union_list = BaselineLinkedList()
+    while llist_1.head:
+        hash_table[llist_1.head.value] = 1
+        llist_1.head = llist_1.head.next
+    while llist_2.head:
+        hash_table[llist_2.head.value] = 1
+        llist_2.head = llist_2.head.next
+    for key in hash_table:
+        union_list.append(key)
+    return union_list
+
+
+def baseline_intersection(llist_1, llist_2):
+    # The original intersection, O(n + m + k^2) for an intersection of k values
+    hash_list_1 = {}
+    hash_list_2 = {}
+    intersection_list = BaselineLinkedList()
+    while llist_1.head:
+        hash_list_1[llist_1.head.value] = 1
+        llist_1.head = llist_1.head.next
+    while llist_2.head:
+        hash_list_2[llist_2.head.value] = 1
+        llist_2.head = llist_2.head.next
+    for key in hash_list_1:
+        if key in hash_list_2:
+            intersection_list.append(key)
+    return intersection_list
+
+
+def benchmark_union_and_intersection(sizes=(10**4, 10**5, 10**6), baseline_max_size=10**4):
+    print("\nBenchmark - union and intersection of two lists of n elements, half of them shared:\n")
+    for size in sizes:
+        linked_list_1 = LinkedList(range(size))
+        linked_list_2 = LinkedList(range(size // 2, size + size // 2))
+
+        start = time.perf_counter()
+        union(linked_list_1, linked_list_2)
+        union_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        intersection(linked_list_1, linked_list_2)
+        intersection_time = time.perf_counter() - start
+
+        print("{:>8}  union {:.3f}s  intersection {:.3f}s".format(size, union_time, intersection_time), end="")
+
+        # The original versions are quadratic in the size of the result, so they are only run on small sizes.
+        # They consume their inputs, so each gets its own lists
+        if size > baseline_max_size:
+            print("  (original versions skipped above {})".format(baseline_max_size))
+            continue
+        start = time.perf_counter()
+        baseline_union(BaselineLinkedList(range(size)), BaselineLinkedList(range(size // 2, size + size // 2)))
+        baseline_union_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        baseline_intersection(BaselineLinkedList(range(size)), BaselineLinkedList(range(size // 2, size + size // 2)))
+        baseline_intersection_time = time.perf_counter() - start
+
+        print(
+            "  original union {:.3f}s  original intersection {:.3f}s".format(
+                baseline_union_time, baseline_intersection_time
+            )
+        )
+
+
 if __name__ == "__main__":
     default_test_case_1()
     default_test_case_2()
     test_01()
     test_02()
     test_03()
+    test_04()
+    test_05()
+    test_06()
+    test_07()
+    if "--benchmark" in sys.argv:
+        benchmark_union_and_intersection()
+        benchmark_sorted()
+        benchmark_roaring()
+        benchmark_partitioned()
@@ -0,0 +1,252 @@
+"""
+Benchmark Runner
+Runs parameterized workloads at increasing sizes against every problem in this project:
+LRU_Cache, find_files, HuffmanTree, is_user_in_group, BlockChain and union / intersection.
+
+For each workload and size it records the best wall clock time of a few runs, the peak memory
+allocated while running (tracemalloc) and, optionally, the hottest functions (cProfile).
+Results can be saved as a baseline JSON file, and later runs compared against it, failing
+when a workload gets slower or allocates more than a configurable threshold.
+
+Usage:
+    python benchmark.py
+    python benchmark.py --sizes 1000 10000 --save-baseline baseline.json
+    python benchmark.py --baseline baseline.json --threshold 0.25 --profile
+"""
+
+import argparse
+import cProfile
+import importlib.util
+import io
+import json
+import os
+import pstats
+import random
+import shutil
+import string
+import sys
+import tempfile
+import time
+import tracemalloc
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_module(file_name):
+    """
+    Imports one of the numbered problem files, which cannot be imported with a normal import statement
+    because module names cannot start with a digit. The module is registered in sys.modules under its name
+    without the number, e.g. 01_lru_cache.py is lru_cache, so its classes and functions can be pickled.
+    """
+    name = file_name[3:-3]
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(name, os.path.join(DIRECTORY, file_name))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+# Every workload takes the size and returns a function running the operations to measure,
+# so that building the inputs is not measured. A workload can also return a cleanup function.
+
+
+def lru_cache_workload(size):
+    module = load_module("01_lru_cache.py")
+    rng = random.Random(size)
+    keys = [rng.randrange(size // 5 + 1) for _ in range(size)]
+
+    def run():
+        cache = module.LRU_Cache(size // 10 + 1)
+        for key in keys:
+            if cache.get(key) == -1:
+                cache.set(key, key)
+
+    return run, None
+
+
+def find_files_workload(size):
+    module = load_module("02_file_recursion.py")
+    # A tree of directories ten wide, with size / 10 files spread across them
+    root = tempfile.mkdtemp()
+    for index in range(size // 10):
+        directory = os.path.join(root, *str(index)[:-1])
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "{}.{}".format(index, "c" if index % 2 else "h")), "w"):
+            pass
+
+    def run():
+        module.find_files(".c", root)
+
+    return run, lambda: shutil.rmtree(root)
+
+
+def huffman_workload(size):
+    module = load_module("03_huffman_coding.py")
+    rng = random.Random(size)
+    message = "".join(rng.choices(string.ascii_letters + " ", weights=range(1, 54), k=size))
+
+    def run():
+        encoded, tree = module.HuffmanTree.huffman_encoding(message)
+        module.HuffmanTree.huffman_decoding(encoded, tree)
+
+    return run, None
+
+
+def active_directory_workload(size):
+    module = load_module("04_active_directory.py")
+    # A tree of groups four wide, with one user in each group, checked from the root
+    groups = [module.Group("group{}".format(index)) for index in range(size // 10 + 1)]
+    for index, group in enumerate(groups):
+        group.add_user("user{}".format(index))
+        if index:
+            groups[(index - 1) // 4].add_group(group)
+    users = ["user{}".format(index) for index in range(0, len(groups), max(1, len(groups) // 20))] + ["missing"]
+
+    def run():
+        for user in users:
+            module.is_user_in_group(user, groups[0])
+
+    return run, None
+
+
+def blockchain_workload(size):
+    module = load_module("05_blockchain.py")
+    entries = [(index, "Transaction {}".format(index)) for index in range(size // 10 + 1)]
+
+    def run():
+        block_chain = module.BlockChain()
+        for timestamp, data in entries:
+            block_chain.append(timestamp, data)
+
+    return run, None
+
+
+def union_intersection_workload(size):
+    module = load_module("06_union_and_intersection.py")
+    rng = random.Random(size)
+    llist_1 = module.LinkedList(rng.randrange(size) for _ in range(size))
+    llist_2 = module.LinkedList(rng.randrange(size) for _ in range(size))
+
+    def run():
+        module.union(llist_1, llist_2)
+        module.intersection(llist_1, llist_2)
+
+    return run, None
+
+
+WORKLOADS = {
+    "lru_cache": lru_cache_workload,
+    "find_files": find_files_workload,
+    "huffman_coding": huffman_workload,
+    "active_directory": active_directory_workload,
+    "blockchain": blockchain_workload,
+    "union_and_intersection": union_intersection_workload,
+}
+
+
+def measure(run, repeat=3, profile_lines=0):
+    """
+    Best wall clock time of repeat runs, then the peak traced memory of one more run,
+    kept separate because tracing allocations slows the run down.
+
+    Returns:
+        (seconds, peak_bytes, profile report or None)
+    """
+    seconds = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        seconds = min(seconds, time.perf_counter() - start)
+
+    tracemalloc.start()
+    run()
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    report = None
+    if profile_lines:
+        profiler = cProfile.Profile()
+        profiler.runcall(run)
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(profile_lines)
+        report = stream.getvalue()
+    return seconds, peak_bytes, report
+
+
+def run_benchmarks(workloads, sizes, repeat=3, profile_lines=0):
+    """
+    Runs every workload at every size.
+
+    Returns:
+        a dictionary of {"workload/size": {"seconds": ..., "peak_bytes": ...}}
+    """
+    results = {}
+    for name in workloads:
+        for size in sizes:
+            run, cleanup = WORKLOADS[name](size)
+            try:
+                seconds, peak_bytes, report = measure(run, repeat, profile_lines)
+            finally:
+                if cleanup is not None:
+                    cleanup()
+            key = "{}/{}".format(name, size)
+            results[key] = {"seconds": seconds, "peak_bytes": peak_bytes}
+            print("{:<32} {:>10.4f}s {:>10.1f} KB".format(key, seconds, peak_bytes / 1e3))
+            if report:
+                print(report)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Compares results with a baseline, a result regresses if its time or peak memory
+    is more than threshold (a fraction, 0.2 is 20%) above the baseline.
+
+    Returns:
+        a list of regression messages, empty if there are none
+    """
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        for metric in ("seconds", "peak_bytes"):
+            before, after = baseline[key][metric], result[metric]
+            if before > 0 and after > before * (1 + threshold):
+                regressions.append(
+                    "{} {} regressed by {:.0%}: {:.6g} -> {:.6g}".format(key, metric, after / before - 1, before, after)
+                )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the data structures of every problem")
+    parser.add_argument("--workloads", nargs="+", choices=sorted(WORKLOADS), default=list(WORKLOADS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3, help="runs timed per size, the best is kept")
+    parser.add_argument("--profile", nargs="?", type=int, const=10, default=0, help="print the top N functions")
+    parser.add_argument("--baseline", help="baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed regression, as a fraction")
+    parser.add_argument("--save-baseline", help="write the results as a baseline JSON file")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.workloads, args.sizes, args.repeat, args.profile)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.threshold)
+        for regression in regressions:
+            print(regression)
+        if regressions:
+            return 1
+        print("No regressions above {:.0%}".format(args.threshold))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())